@@ -0,0 +1,138 @@
+# Benchmark cases: each entry of CASES maps a name to a setup function that fills the stand-in
+# tables and returns the callable to time. Data is generated from a fixed seed, so call counts
+# are deterministic and timings comparable from run to run.
+import datetime
+import random
+
+from benchmarks import stubs
+
+SEED = 20240601
+
+
+def _lcv_distribution(n_items, n_taxes, n_groups, cached=False):
+    from my_custom_app.overrides.landed_cost_voucher import custom_distribute_charges_by_ngp
+
+    rng = random.Random(SEED)
+    codes = [f"NGP-{g:04d}" for g in range(n_groups)]
+    # Rows carry their NGP code snapshot (set_item_ngp_codes), so the distribution reads no Item
+    items = [
+        stubs._dict(
+            item_code=f"ITEM-{i:05d}",
+            custom_ngp_code=codes[i % n_groups],
+            amount=round(rng.uniform(10, 5000), 2),
+            qty=rng.randint(1, 100),
+            applicable_charges=0,
+        )
+        for i in range(n_items)
+    ]
+    # Half the charges are NGP duties for one code, half are spread over every item
+    taxes = [
+        stubs._dict(
+            idx=t + 1,
+            amount=round(rng.uniform(50, 20000), 2),
+            expense_account="Droits NGP - TC" if t % 2 == 0 else "Fret - TC",
+            custom_ngp_code=codes[t % n_groups] if t % 2 == 0 else None,
+        )
+        for t in range(n_taxes)
+    ]
+    doc = stubs.Document(
+        name="LCV-BENCH", distribute_charges_based_on="Amount", items=items, taxes=taxes
+    )
+
+    def run():
+        stubs.new_request()
+        if not cached:
+            doc.custom_allocation_fingerprint = None
+        custom_distribute_charges_by_ngp(doc)
+
+    return run
+
+
+def _visit_target_validation(n_rows):
+    from my_custom_app.overrides.sales_person_validation import check_visit_target_details
+
+    # Three consecutive, non-overlapping quarters per customer plus a few territory targets
+    rows = []
+    for i in range(n_rows):
+        quarter = datetime.date(2024, 1 + 3 * (i % 3), 1)
+        end = (quarter.replace(day=28) + datetime.timedelta(days=65)).replace(day=1) - datetime.timedelta(days=1)
+        target = {"customer": f"CUST-{i // 3:05d}"} if i % 10 else {"territory": f"TERR-{i // 30:03d}-{i % 3}"}
+        rows.append(
+            stubs._dict(period_type="Custom Range", start_date=quarter, end_date=end, goal_number_of_visits=4, **target)
+        )
+    doc = stubs.Document(name="SP-BENCH", custom_number_visit_target=rows)
+
+    def run():
+        check_visit_target_details(doc, "before_save")
+
+    return run
+
+
+def _visit_log_submit(n_targets):
+    from my_custom_app.test_application.doctype.sales_visit_log.sales_visit_log import SalesVisitLog
+
+    territories = ["All Territories", "Tunisia", "Nord", "Tunis"]
+    stubs.TABLES["Territory"] = [
+        stubs._dict(name=name, parent_territory=parent)
+        for name, parent in zip(territories, [None, *territories[:-1]], strict=True)
+    ]
+    stubs.TABLES["Customer"] = [
+        stubs._dict(name=f"CUST-{c:05d}", territory="Tunis") for c in range(n_targets)
+    ]
+    stubs.TABLES["Visit Target Detail"] = [
+        stubs._dict(
+            name=f"VTD-{c:05d}", parent="SP-BENCH", parenttype="Sales Person",
+            parentfield="custom_number_visit_target", idx=c + 1, customer=f"CUST-{c:05d}", territory=None,
+            start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2024, 3, 31),
+        )
+        for c in range(n_targets)
+    ] + [
+        stubs._dict(
+            name=f"VTD-T{t}", parent="SP-BENCH", parenttype="Sales Person",
+            parentfield="custom_number_visit_target", idx=n_targets + t + 1, customer=None, territory=territory,
+            start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2024, 3, 31),
+        )
+        for t, territory in enumerate(territories)
+    ]
+    log = SalesVisitLog(
+        name="SVL-BENCH", sales_person="SP-BENCH", customer=f"CUST-{n_targets // 2:05d}", visit_date="2024-02-15"
+    )
+
+    def run():
+        stubs.new_request()
+        log.update_visit_target_count()
+
+    return run
+
+
+def _coa_csv_to_tree():
+    from my_custom_app.setup.tunisia_coa.parser import build_tree, read_csv
+
+    def run():
+        build_tree(read_csv())
+
+    return run
+
+
+def _coa_artifact_load():
+    from my_custom_app.setup.tunisia_coa.parser import load_tree
+
+    def run():
+        load_tree.__wrapped__()
+
+    return run
+
+
+CASES = {
+    "lcv_distribution[50x4x5]": lambda: _lcv_distribution(50, 4, 5),
+    "lcv_distribution[500x20x20]": lambda: _lcv_distribution(500, 20, 20),
+    "lcv_distribution[2000x60x100]": lambda: _lcv_distribution(2000, 60, 100),
+    "lcv_distribution_cached[2000x60x100]": lambda: _lcv_distribution(2000, 60, 100, cached=True),
+    "visit_target_validation[10]": lambda: _visit_target_validation(10),
+    "visit_target_validation[300]": lambda: _visit_target_validation(300),
+    "visit_target_validation[3000]": lambda: _visit_target_validation(3000),
+    "visit_log_submit[100]": lambda: _visit_log_submit(100),
+    "visit_log_submit[1000]": lambda: _visit_log_submit(1000),
+    "coa_csv_to_tree": _coa_csv_to_tree,
+    "coa_artifact_load": _coa_artifact_load,
+}
@@ -0,0 +1,164 @@
+# Run the offline benchmark suite and compare it with baseline.json.
+#
+#   python -m benchmarks                    run every case, fail on regressions
+#   python -m benchmarks --update           record the current results as the baseline
+#   python -m benchmarks -k lcv             only cases whose name contains "lcv"
+#
+# Per case it records the time per call, the stand-in queries and cache calls made by one call
+# and the peak memory allocated during one call. Times are stored relative to a fixed pure-Python
+# calibration workload, so a baseline recorded on one machine is usable on another. Query and
+# cache call counts must never go up; time and memory may grow by --threshold at most.
+# Baselines are kept per backend ("numpy" / "python"), as the allocation engine uses NumPy
+# when it is installed.
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks import stubs
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SAMPLES = 9
+SAMPLE_SECONDS = 0.05
+# A case that looks slower is measured again this many times before it counts as a regression
+RETRIES = 2
+# Small absolute allowance on top of the relative memory threshold
+MEMORY_SLACK_KB = 64
+
+
+def calibrate():
+    """Seconds taken by a fixed workload (sorting, dict building, float arithmetic)."""
+    start = time.perf_counter()
+    values = [(i * 7919) % 100003 / 7.0 for i in range(20000)]
+    index = {i: value for i, value in enumerate(sorted(values))}
+    sum(value * 1.01 for value in index.values())
+    return time.perf_counter() - start
+
+
+def measure(run):
+    run()  # warm up: imports, caches, first-call effects
+
+    stubs.CALLS.clear()
+    run()
+    calls = {key: value for key, value in sorted(stubs.CALLS.items()) if value}
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Enough calls per sample to make each sample last about SAMPLE_SECONDS. Calibration runs are
+    # interleaved with the samples, so both see the same machine load.
+    start = time.perf_counter()
+    run()
+    single = max(time.perf_counter() - start, 1e-6)
+    number = max(1, int(SAMPLE_SECONDS / single))
+    best, best_calibration = float("inf"), float("inf")
+    for _ in range(SAMPLES):
+        best_calibration = min(best_calibration, calibrate())
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    return {
+        "seconds": best,
+        "relative_time": float(f"{best / best_calibration:.4g}"),
+        "calls": calls,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def is_slower(result, baseline, threshold):
+    return bool(baseline) and result["relative_time"] > baseline["relative_time"] * (1 + threshold)
+
+
+def run_case(setup):
+    """Measure one case on fresh stand-in state; time is in units of the calibration workload."""
+    stubs.TABLES.clear()
+    stubs.reset()
+    result = measure(setup())
+    return result, result.pop("seconds")
+
+
+def compare(name, result, baseline, threshold):
+    """Regression messages for `result` against the baseline entry of the same case."""
+    failures = []
+    if not baseline:
+        return failures
+
+    if is_slower(result, baseline, threshold):
+        failures.append(
+            f"{name}: time {result['relative_time']:.4g} vs baseline {baseline['relative_time']:.4g} (x calibration)"
+        )
+    if result["peak_kb"] > baseline["peak_kb"] * (1 + threshold) + MEMORY_SLACK_KB:
+        failures.append(f"{name}: peak memory {result['peak_kb']} KB vs baseline {baseline['peak_kb']} KB")
+    for key, count in result["calls"].items():
+        if count > baseline["calls"].get(key, 0):
+            failures.append(f"{name}: {key} {count} calls vs baseline {baseline['calls'].get(key, 0)}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for my_custom_app")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed relative slowdown and memory growth (default 0.5)")
+    parser.add_argument("-k", dest="filter", default="", help="only run cases whose name contains this")
+    args = parser.parse_args(argv)
+
+    stubs.install()
+    from benchmarks.cases import CASES
+    from my_custom_app.landed_cost import allocation
+
+    backend = "numpy" if allocation.np is not None else "python"
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baselines = json.load(f)
+    baseline = baselines.get(backend, {})
+
+    print(f"backend: {backend}")
+    print(f"{'case':<40} {'ms/call':>10} {'x calib':>9} {'vs base':>8} {'peak KB':>9}  calls")
+
+    results, failures = {}, []
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        result, seconds = run_case(setup)
+        base = baseline.get(name)
+        for _ in range(RETRIES):
+            if args.update or not is_slower(result, base, args.threshold):
+                break
+            # Shared machines are noisy: keep the fastest of the attempts
+            retry, retry_seconds = run_case(setup)
+            if retry["relative_time"] < result["relative_time"]:
+                result, seconds = retry, retry_seconds
+        results[name] = result
+
+        change = f"{result['relative_time'] / base['relative_time'] - 1:+.0%}" if base else "new"
+        calls = ", ".join(f"{key}={value}" for key, value in result["calls"].items())
+        print(
+            f"{name:<40} {seconds * 1000:>10.3f} "
+            f"{result['relative_time']:>9.4g} {change:>8} {result['peak_kb']:>9}  {calls}"
+        )
+        failures += compare(name, result, base, args.threshold)
+
+    if args.update:
+        baselines[backend] = {**baseline, **results}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"baseline updated: {BASELINE_PATH}")
+        return 0
+
+    if not baseline:
+        print(f"no {backend} baseline yet, run with --update to record one")
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+# In-memory stand-ins for frappe (and redis) so the app's hot paths run without a site.
+#
+# install() registers fake `frappe`, `frappe.utils`, `frappe.utils.nestedset`, `frappe.model`,
+# `frappe.model.document` and `redis` modules before any app module is imported. Tables are
+# plain lists of _dict rows in TABLES; get_all / get_value / sql and the cache calls are counted
+# in CALLS, which is what the suite compares as "queries" and "cache calls".
+import datetime
+import sys
+import types
+import uuid
+from collections import Counter
+
+CALLS = Counter()
+TABLES = {}
+
+
+class _dict(dict):
+    __getattr__ = dict.get
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __delattr__(self, key):
+        del self[key]
+
+    def copy(self):
+        return _dict(self)
+
+
+class ValidationError(Exception):
+    pass
+
+
+class PermissionError(Exception):  # mirrors frappe.PermissionError
+    pass
+
+
+# --- frappe.utils ---------------------------------------------------------------------------
+
+
+def flt(value, precision=None):
+    try:
+        value = float(value or 0)
+    except (TypeError, ValueError):
+        value = 0.0
+    return round(value, precision) if precision is not None else value
+
+
+def cint(value):
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def getdate(value=None):
+    if value is None:
+        return datetime.date.today()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def today():
+    return datetime.date.today().isoformat()
+
+
+def now():
+    return datetime.datetime.now().isoformat(sep=" ")
+
+
+def add_days(date, days):
+    return getdate(date) + datetime.timedelta(days=days)
+
+
+def get_first_day(date):
+    return getdate(date).replace(day=1)
+
+
+def get_last_day(date):
+    date = getdate(date)
+    return (date.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+
+
+def get_quarter_start(date):
+    date = getdate(date)
+    return datetime.date(date.year, 3 * ((date.month - 1) // 3) + 1, 1)
+
+
+def get_quarter_ending(date):
+    start = get_quarter_start(date)
+    return get_last_day(datetime.date(start.year, start.month + 2, 1))
+
+
+def get_descendants_of(doctype, name):
+    return []
+
+
+# --- database ---------------------------------------------------------------------------------
+
+
+def _matches(row, filters):
+    for field, condition in (filters or {}).items():
+        value = row.get(field)
+        if not isinstance(condition, (list, tuple)):
+            if value != condition:
+                return False
+            continue
+        operator, operand = condition
+        if operator == "in" and value not in operand:
+            return False
+        if operator == "<=" and not (value is not None and value <= operand):
+            return False
+        if operator == ">=" and not (value is not None and value >= operand):
+            return False
+        if operator == "is" and bool(value) != (operand == "set"):
+            return False
+    return True
+
+
+def _sort(rows, order_by):
+    for part in reversed([p.strip() for p in (order_by or "").split(",") if p.strip()]):
+        field, _space, direction = part.partition(" ")
+        rows.sort(key=lambda row: (row.get(field) is None, row.get(field)), reverse=direction.lower() == "desc")
+    return rows
+
+
+def get_all(doctype, filters=None, fields=None, pluck=None, as_list=False, order_by=None, **kwargs):
+    CALLS["db.get_all"] += 1
+    rows = _sort([row for row in TABLES.get(doctype, ()) if _matches(row, filters)], order_by)
+    if pluck:
+        return [row.get(pluck) for row in rows]
+    fields = fields or ["name"]
+    if as_list:
+        return [tuple(row.get(field) for field in fields) for row in rows]
+    return [_dict((field, row.get(field)) for field in fields) for row in rows]
+
+
+class CallbackList(list):
+    def add(self, callback):
+        self.append(callback)
+
+    def run(self):
+        callbacks = list(self)
+        self.clear()
+        for callback in callbacks:
+            callback()
+
+
+class FakeDB:
+    def __init__(self):
+        self.after_commit = CallbackList()
+        self.after_rollback = CallbackList()
+
+    def sql(self, query, values=None, as_dict=False, **kwargs):
+        CALLS["db.sql"] += 1
+        return []
+
+    def get_value(self, doctype, filters, fieldname="name", as_dict=False):
+        CALLS["db.get_value"] += 1
+        if isinstance(filters, str):
+            filters = {"name": filters}
+        for row in TABLES.get(doctype, ()):
+            if _matches(row, filters):
+                if isinstance(fieldname, (list, tuple)):
+                    values = _dict((field, row.get(field)) for field in fieldname)
+                    return values if as_dict else tuple(values.values())
+                return row.get(fieldname)
+        return None
+
+    def savepoint(self, name):
+        pass
+
+    def rollback(self, save_point=None):
+        self.after_rollback.run()
+
+    def commit(self):
+        self.after_commit.run()
+
+
+# --- cache ------------------------------------------------------------------------------------
+
+
+class Redis:
+    """Only what the app calls on redis.Redis directly (with a FakeCache as `self`)."""
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        CALLS["cache.hset"] += 1
+        bucket = self.store.setdefault(name, {})
+        if mapping:
+            bucket.update({k.encode() if isinstance(k, str) else k: v for k, v in mapping.items()})
+        if key is not None:
+            bucket[key.encode() if isinstance(key, str) else key] = value
+
+    def hgetall(self, name):
+        CALLS["cache.hgetall"] += 1
+        return dict(self.store.get(name, {}))
+
+
+class FakeCache(Redis):
+    """frappe.cache() API over a dict; values are kept as objects except raw redis hashes."""
+
+    def __init__(self):
+        self.store = {}
+
+    def make_key(self, key):
+        return f"site:{key}"
+
+    def get_value(self, key, generator=None, expires=False):
+        CALLS["cache.get_value"] += 1
+        key = self.make_key(key)
+        if key not in self.store and generator:
+            self.store[key] = generator()
+        return self.store.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        CALLS["cache.set_value"] += 1
+        self.store[self.make_key(key)] = value
+
+    def delete_value(self, keys):
+        for key in [keys] if isinstance(keys, str) else keys:
+            self.store.pop(self.make_key(key), None)
+
+    def hget(self, name, key, generator=None):
+        CALLS["cache.hget"] += 1
+        bucket = self.store.setdefault(self.make_key(name), {})
+        if key not in bucket and generator:
+            bucket[key] = generator()
+        return bucket.get(key)
+
+    def hdel(self, name, keys):
+        bucket = self.store.get(self.make_key(name), {})
+        for key in [keys] if isinstance(keys, str) else keys:
+            bucket.pop(key, None)
+
+    def hmget(self, name, keys):
+        CALLS["cache.hmget"] += 1
+        bucket = self.store.get(name, {})
+        return [bucket.get(key.encode()) for key in keys]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def hincrby(self, name, key, amount=1):
+        bucket = self.store.setdefault(name, {})
+        bucket[key.encode()] = int(bucket.get(key.encode(), 0)) + amount
+
+
+class FakePipeline:
+    """Queues FakeCache calls and runs them on execute(), counted as one round trip."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        CALLS["cache.pipeline"] += 1
+        commands, self.commands = self.commands, []
+        return [getattr(self.cache, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+# --- documents --------------------------------------------------------------------------------
+
+
+class Document:
+    def __init__(self, *args, **kwargs):
+        data = args[0] if args else kwargs
+        self.flags = _dict()
+        self.name = None
+        self.docstatus = 0
+        for key, value in data.items():
+            setattr(self, key, value)
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def set(self, key, value):
+        setattr(self, key, value)
+
+    def is_new(self):
+        return not self.name
+
+    def append(self, fieldname, row):
+        rows = getattr(self, fieldname, None) or []
+        row = _dict(row)
+        rows.append(row)
+        setattr(self, fieldname, rows)
+        return row
+
+
+# --- module wiring ----------------------------------------------------------------------------
+
+
+def _throw(message, exc=ValidationError, title=None, as_list=False, **kwargs):
+    raise exc(message)
+
+
+def _whitelist(*args, **kwargs):
+    if args and callable(args[0]):
+        return args[0]
+    return lambda fn: fn
+
+
+class _Logger:
+    def error(self, *args, **kwargs):
+        pass
+
+    info = warning = debug = error
+
+
+def reset():
+    """Forget counters, cached values and per-request state; tables are kept."""
+    frappe = sys.modules["frappe"]
+    CALLS.clear()
+    frappe._cache = FakeCache()
+    frappe.db = FakeDB()
+    frappe.local = types.SimpleNamespace(flags=_dict())
+
+
+def new_request():
+    """Drop per-request state (frappe.local) while keeping the cache, like a new web request."""
+    frappe = sys.modules["frappe"]
+    frappe.db.after_commit.clear()
+    frappe.db.after_rollback.clear()
+    frappe.local = types.SimpleNamespace(flags=_dict())
+
+
+def install():
+    frappe = types.ModuleType("frappe")
+    frappe.__path__ = []
+    frappe._dict = _dict
+    frappe._ = lambda message, *args, **kwargs: message
+    frappe.ValidationError = ValidationError
+    frappe.PermissionError = PermissionError
+    frappe.throw = _throw
+    frappe.msgprint = lambda *args, **kwargs: CALLS.update(["msgprint"])
+    frappe.clear_messages = lambda: None
+    frappe.whitelist = _whitelist
+    frappe.cache = lambda: frappe._cache
+    frappe.get_all = get_all
+    frappe.get_list = get_all
+    frappe.get_doc = lambda *args, **kwargs: Document(*args, **kwargs)
+    frappe.get_cached_value = lambda doctype, name, fieldname: frappe.db.get_value(doctype, name, fieldname)
+    frappe.has_permission = lambda *args, **kwargs: True
+    frappe.only_for = lambda *args, **kwargs: None
+    frappe.generate_hash = lambda *args, length=10, **kwargs: uuid.uuid4().hex[:length]
+    frappe.enqueue = lambda *args, **kwargs: CALLS.update(["enqueue"])
+    frappe.publish_realtime = lambda *args, **kwargs: CALLS.update(["publish_realtime"])
+    frappe.logger = lambda *args, **kwargs: _Logger()
+    frappe.conf = _dict()
+    frappe.session = _dict(user="Administrator")
+    frappe.defaults = types.SimpleNamespace(get_user_default=lambda key: None, set_user_default=lambda *a: None)
+
+    utils = types.ModuleType("frappe.utils")
+    utils.__path__ = []
+    for fn in (
+        flt, cint, getdate, today, now, add_days,
+        get_first_day, get_last_day, get_quarter_start, get_quarter_ending,
+    ):
+        setattr(utils, fn.__name__, fn)
+    nestedset = types.ModuleType("frappe.utils.nestedset")
+    nestedset.get_descendants_of = get_descendants_of
+    model = types.ModuleType("frappe.model")
+    model.__path__ = []
+    document = types.ModuleType("frappe.model.document")
+    document.Document = Document
+    desk = types.ModuleType("frappe.desk")
+    desk.__path__ = []
+    reportview = types.ModuleType("frappe.desk.reportview")
+    # Benchmarks run as Administrator: no permission conditions
+    reportview.get_match_cond = lambda doctype, as_condition=True: ""
+    frappe.utils, frappe.model, frappe.desk = utils, model, desk
+    utils.nestedset, model.document, desk.reportview = nestedset, document, reportview
+
+    redis = types.ModuleType("redis")
+    redis.Redis = Redis
+
+    sys.modules.update(
+        {
+            "frappe": frappe,
+            "frappe.utils": utils,
+            "frappe.utils.nestedset": nestedset,
+            "frappe.model": model,
+            "frappe.model.document": document,
+            "frappe.desk": desk,
+            "frappe.desk.reportview": reportview,
+            "redis": redis,
+        }
+    )
+    reset()
+    return frappe
+
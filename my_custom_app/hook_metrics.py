@@ -0,0 +1,168 @@
+# Latency and query-count metrics for the app's document event handlers.
+#
+# Handlers registered in hooks.py doc_events (and the Sales Visit Log submit/cancel methods) are
+# decorated with @instrumented. When `my_custom_app_hook_metrics` is set in site config, each call
+# records its wall time, the number of SQL queries it ran and the rows they returned or touched
+# into hourly histograms in the cache, per handler and doctype; get_hook_metrics reads back
+# p50/p95/p99 over a rolling window. When the flag is off the decorator costs one config lookup.
+import functools
+import math
+import time
+
+import frappe
+from frappe.utils import cint
+
+from my_custom_app.utils import get_counters
+
+CONFIG_KEY = "my_custom_app_hook_metrics"
+HISTOGRAM_KEY = "my_custom_app:hook_metrics:"
+INDEX_KEY = "my_custom_app:hook_metrics_index:"
+WINDOW_HOURS = 24
+METRICS = ("ms", "queries", "rows")
+# Histogram bins are quarter octaves: ~19% wide, enough for percentiles at any scale
+BINS_PER_OCTAVE = 4
+
+
+def instrumented(handler):
+    """Record metrics for `handler(doc, ...)` (a doc event function or a document method)."""
+    hook = f"{handler.__module__}.{handler.__qualname__}"
+
+    @functools.wraps(handler)
+    def wrapper(doc, *args, **kwargs):
+        if not frappe.conf.get(CONFIG_KEY):
+            return handler(doc, *args, **kwargs)
+
+        counter = _start_counting()
+        start = time.perf_counter()
+        try:
+            return handler(doc, *args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            queries, rows = _stop_counting(counter)
+            _record(hook, getattr(doc, "doctype", None) or "-", {"ms": elapsed, "queries": queries, "rows": rows})
+
+    return wrapper
+
+
+def _start_counting():
+    # frappe.db.sql is shadowed on the instance for the outermost instrumented call only;
+    # nested handlers read the same counter, so their numbers include what they call
+    state = getattr(frappe.local, "hook_metrics_counter", None)
+    if state is None:
+        state = frappe.local.hook_metrics_counter = {"queries": 0, "rows": 0, "depth": 0}
+        db = frappe.db
+        sql = type(db).sql
+
+        def counting_sql(*args, **kwargs):
+            result = sql(db, *args, **kwargs)
+            state["queries"] += 1
+            cursor = getattr(db, "_cursor", None)
+            state["rows"] += max(getattr(cursor, "rowcount", 0) or 0, 0)
+            return result
+
+        db.sql = counting_sql
+    state["depth"] += 1
+    return dict(state)
+
+
+def _stop_counting(started):
+    state = frappe.local.hook_metrics_counter
+    state["depth"] -= 1
+    if not state["depth"]:
+        frappe.local.hook_metrics_counter = None
+        del frappe.db.sql
+    return state["queries"] - started["queries"], state["rows"] - started["rows"]
+
+
+def _bin(value):
+    return -1 if value <= 0 else math.floor(math.log2(value) * BINS_PER_OCTAVE)
+
+
+def _bin_upper_bound(bin):
+    return 0 if bin < 0 else 2 ** ((bin + 1) / BINS_PER_OCTAVE)
+
+
+def _hour(offset=0):
+    return int(time.time() // 3600) - offset
+
+
+def _record(hook, doctype, values):
+    try:
+        cache = frappe.cache()
+        series = f"{hook}|{doctype}"
+        hour = _hour()
+        key = cache.make_key(f"{HISTOGRAM_KEY}{hour}:{series}")
+        index = cache.make_key(f"{INDEX_KEY}{hour}")
+        ttl = (WINDOW_HOURS + 1) * 3600
+
+        pipe = cache.pipeline()
+        for metric, value in values.items():
+            pipe.hincrby(key, f"{metric}:{_bin(value)}", 1)
+        pipe.expire(key, ttl)
+        pipe.sadd(index, series)
+        pipe.expire(index, ttl)
+        pipe.execute()
+    except Exception:
+        # Metrics must never break a save
+        frappe.log_error(title="Hook metrics could not be recorded")
+
+
+@frappe.whitelist()
+def get_hook_metrics(hours=WINDOW_HOURS, doctype=None):
+    """
+    Calls and p50/p95/p99 of wall time (ms), query count and row count per handler and doctype
+    over the last `hours` hours (at most WINDOW_HOURS). Percentiles are bin upper bounds.
+    """
+    frappe.only_for("System Manager")
+    cache = frappe.cache()
+    hours = min(max(cint(hours), 1), WINDOW_HOURS)
+
+    histograms = {}
+    for offset in range(hours):
+        hour = _hour(offset)
+        for series in cache.smembers(f"{INDEX_KEY}{hour}"):
+            series = series.decode()
+            if doctype and not series.endswith(f"|{doctype}"):
+                continue
+            counts = get_counters(f"{HISTOGRAM_KEY}{hour}:{series}")
+            merged = histograms.setdefault(series, {metric: {} for metric in METRICS})
+            for field, count in counts.items():
+                metric, bin = field.split(":")
+                merged[metric][int(bin)] = merged[metric].get(int(bin), 0) + count
+
+    result = []
+    for series, metrics in sorted(histograms.items()):
+        hook, series_doctype = series.rsplit("|", 1)
+        entry = {"hook": hook, "doctype": series_doctype, "calls": sum(metrics["ms"].values())}
+        for metric, bins in metrics.items():
+            entry[metric] = {f"p{p}": _percentile(bins, p / 100, metric != "ms") for p in (50, 95, 99)}
+        result.append(entry)
+    return result
+
+
+def _percentile(bins, fraction, integer=False):
+    total = sum(bins.values())
+    if not total:
+        return None
+    seen = 0
+    for bin in sorted(bins):
+        seen += bins[bin]
+        if seen >= fraction * total:
+            # Bins are narrower than 1 up to 4, so small counts come back exact
+            bound = _bin_upper_bound(bin)
+            return math.floor(bound) if integer else round(bound, 2)
+
+
+@frappe.whitelist()
+def reset_hook_metrics():
+    frappe.only_for("System Manager")
+    cache = frappe.cache()
+    keys = []
+    for offset in range(WINDOW_HOURS + 1):
+        hour = _hour(offset)
+        keys.append(cache.make_key(f"{INDEX_KEY}{hour}"))
+        keys += [
+            cache.make_key(f"{HISTOGRAM_KEY}{hour}:{series.decode()}")
+            for series in cache.smembers(f"{INDEX_KEY}{hour}")
+        ]
+    cache.delete(*keys)
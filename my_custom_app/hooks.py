@@ -23,7 +23,19 @@ fixtures = [
     {
         "dt": "Custom Field", # Add this entry
         "filters": [
-            ["dt", "in", ["Sales Person", "Item", "Landed Cost Taxes and Charges"]] # Filter by the DocTypes they belong to
+            ["dt", "in", ["Sales Person", "Item", "Landed Cost Taxes and Charges", "Landed Cost Voucher", "Landed Cost Item", "Company"]] # Filter by the DocTypes they belong to
+        ]
+    },
+    {
+        "dt": "Number Card",
+        "filters": [
+            ["name", "in", ["Visits Today", "Visits This Week", "Visits This Month"]]
+        ]
+    },
+    {
+        "dt": "Dashboard Chart",
+        "filters": [
+            ["name", "=", "Visits vs Target"]
         ]
     },
     {
@@ -116,7 +128,7 @@ doctype_js = {
 # ------------
 
 # before_install = "my_custom_app.install.before_install"
-# after_install = "my_custom_app.install.after_install"
+after_install = "my_custom_app.setup.tunisia_coa.provisioning.after_install"
 
 # Uninstallation
 # ------------
@@ -172,34 +184,64 @@ doctype_js = {
 
 doc_events = {
     "Sales Person": {
-        "before_save": "my_custom_app.overrides.sales_person_validation.check_visit_target_details"
+        "before_save": [
+            "my_custom_app.overrides.sales_person_validation.check_visit_target_details",
+            "my_custom_app.overrides.sales_person_validation.keep_completed_visits"
+        ],
+        "on_update": "my_custom_app.visits.progress.on_sales_person_update"
     },
     "Landed Cost Voucher": {
+        "before_validate": [
+            "my_custom_app.overrides.landed_cost_voucher.set_item_ngp_codes",
+            "my_custom_app.landed_cost.duties.set_ngp_duties"
+        ],
         "before_save": "my_custom_app.overrides.landed_cost_voucher.custom_distribute_charges_by_ngp",
         "before_submit": "my_custom_app.overrides.landed_cost_voucher.custom_distribute_charges_by_ngp"
+    },
+    "Item": {
+        "on_update": "my_custom_app.landed_cost.ngp_cache.on_item_update",
+        "after_rename": "my_custom_app.landed_cost.ngp_cache.on_item_rename",
+        "on_trash": "my_custom_app.landed_cost.ngp_cache.on_item_trash"
+    },
+    "NGP Code": {
+        "on_update": "my_custom_app.landed_cost.ngp_cache.on_ngp_code_update",
+        "after_rename": "my_custom_app.landed_cost.ngp_cache.on_ngp_code_rename",
+        "on_trash": "my_custom_app.landed_cost.ngp_cache.on_ngp_code_trash"
+    },
+    "Customer": {
+        "on_update": "my_custom_app.visits.territory_cache.on_customer_update",
+        "after_rename": "my_custom_app.visits.territory_cache.on_customer_rename",
+        "on_trash": "my_custom_app.visits.territory_cache.on_customer_trash"
+    },
+    "Company": {
+        "after_insert": "my_custom_app.setup.tunisia_coa.provisioning.on_company_insert",
+        "on_update": "my_custom_app.setup.tunisia_coa.provisioning.on_company_update"
+    },
+    "Territory": {
+        "after_insert": "my_custom_app.visits.territory_cache.on_territory_change",
+        "on_update": "my_custom_app.visits.territory_cache.on_territory_change",
+        "after_rename": "my_custom_app.visits.territory_cache.on_territory_change",
+        "on_trash": "my_custom_app.visits.territory_cache.on_territory_change"
     }
 }
 
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# 	"all": [
-# 		"my_custom_app.tasks.all"
-# 	],
-# 	"daily": [
-# 		"my_custom_app.tasks.daily"
-# 	],
-# 	"hourly": [
-# 		"my_custom_app.tasks.hourly"
-# 	],
-# 	"weekly": [
-# 		"my_custom_app.tasks.weekly"
-# 	],
-# 	"monthly": [
-# 		"my_custom_app.tasks.monthly"
-# 	],
-# }
+scheduler_events = {
+    "daily": [
+        "my_custom_app.visits.reconcile.reconcile_full",
+        "my_custom_app.visits.rollup.rebuild_recent"
+    ],
+    "hourly": [
+        "my_custom_app.visits.reconcile.reconcile_incremental"
+    ],
+    "cron": {
+        "* * * * *": [
+            "my_custom_app.visits.realtime.publish_pending"
+        ]
+    }
+}
 
 # Testing
 # -------
@@ -0,0 +1,163 @@
+# Landed cost allocation engine.
+#
+# Pure, frappe-independent: takes plain sequences and returns plain lists so the
+# same code path serves the Landed Cost Voucher hook, the form preview and batch jobs.
+from decimal import ROUND_HALF_UP, Decimal
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with most benches, but stay usable without it
+    np = None
+
+
+class Allocation(NamedTuple):
+    # Total charge per row, in currency units (rounded to cents)
+    row_charges: list
+    # Indices of charges that could not be allocated (no matching rows or zero base)
+    unallocated: list
+    # Per charge: list of (row_index, charge) pairs, only filled when detail=True
+    details: list
+
+
+def to_cents(value):
+    """Convert an amount to integer cents, rounding half away from zero."""
+    return int((Decimal(str(value or 0)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def group_rows(row_groups):
+    """Return {group_key: [row_index, ...]} preserving row order inside each group."""
+    index = {}
+    for i, key in enumerate(row_groups):
+        if key:
+            index.setdefault(key, []).append(i)
+    return index
+
+
+def allocate(bases, charges, row_groups=None, charge_groups=None, detail=False):
+    """
+    Distribute each charge over the rows proportionally to `bases`.
+
+    `bases` is one weight per row (amount or qty), `charges` one amount per charge.
+    A charge whose `charge_groups` entry is set only goes to rows whose `row_groups`
+    entry matches; otherwise it goes to every row. Amounts are split in integer cents
+    with the largest-remainder method, so every allocated charge is distributed
+    exactly and the result does not depend on row order.
+    """
+    bases = [float(b or 0) for b in bases]
+    charge_groups = list(charge_groups) if charge_groups is not None else [None] * len(charges)
+    rows_by_group = group_rows(row_groups) if row_groups is not None else {}
+
+    if np is not None:
+        split = _split_numpy
+        weights = np.asarray(bases, dtype=np.float64)
+        row_sets = {key: np.asarray(rows, dtype=np.intp) for key, rows in rows_by_group.items()}
+        all_rows_set = np.arange(len(bases), dtype=np.intp)
+        totals = np.zeros(len(bases), dtype=np.int64)
+    else:
+        split = _split_python
+        weights = bases
+        row_sets = rows_by_group
+        all_rows_set = list(range(len(bases)))
+        totals = [0] * len(bases)
+
+    unallocated = []
+    details = []
+
+    for charge_index, (charge, group) in enumerate(zip(charges, charge_groups, strict=True)):
+        rows = row_sets.get(group) if group else all_rows_set
+        cents = to_cents(charge)
+        shares = split(weights, rows, cents) if rows is not None and len(rows) else None
+
+        if shares is None:
+            unallocated.append(charge_index)
+            if detail:
+                details.append([])
+            continue
+
+        if np is not None:
+            np.add.at(totals, rows, shares)
+        else:
+            for row, share in zip(rows, shares, strict=True):
+                totals[row] += share
+
+        if detail:
+            details.append([(int(row), int(share) / 100) for row, share in zip(rows, shares, strict=True)])
+
+    row_charges = [int(c) / 100 for c in totals]
+    return Allocation(row_charges, unallocated, details)
+
+
+def _split_numpy(weights, rows, cents):
+    w = weights[rows]
+    total = w.sum()
+    if total <= 0:
+        return None
+
+    sign = -1 if cents < 0 else 1
+    exact = abs(cents) * (w / total)
+    shares = np.floor(exact).astype(np.int64)
+    leftover = abs(cents) - int(shares.sum())
+    if leftover > 0:
+        # Largest fractional parts first; stable sort keeps ties in row order
+        order = np.argsort(-(exact - shares), kind="stable")[:leftover]
+        shares[order] += 1
+    elif leftover < 0:
+        # Float noise can push a floor one cent over; take it back from the smallest parts
+        order = np.argsort(exact - shares, kind="stable")[:-leftover]
+        shares[order] -= 1
+    return shares * sign
+
+
+def _split_python(weights, rows, cents):
+    w = [weights[r] for r in rows]
+    total = sum(w)
+    if total <= 0:
+        return None
+
+    sign = -1 if cents < 0 else 1
+    exact = [abs(cents) * x / total for x in w]
+    shares = [int(x) for x in exact]
+    leftover = abs(cents) - sum(shares)
+    if leftover > 0:
+        order = sorted(range(len(rows)), key=lambda i: shares[i] - exact[i])[:leftover]
+        for i in order:
+            shares[i] += 1
+    elif leftover < 0:
+        order = sorted(range(len(rows)), key=lambda i: exact[i] - shares[i])[:-leftover]
+        for i in order:
+            shares[i] -= 1
+    return [s * sign for s in shares]
+
+
+def compute_duties(bases, row_groups, rates):
+    """
+    Duty owed per group: the summed bases of its rows times its rate (in percent), in cents
+    rounded half away from zero. `rates` is {group: rate}; returns {group: amount} for every
+    group that has rows and a non-zero duty.
+    """
+    groups = [group for group in rates if group]
+    if not groups:
+        return {}
+    index = {group: i for i, group in enumerate(groups)}
+
+    if np is not None:
+        codes = np.fromiter((index.get(group, -1) for group in row_groups), dtype=np.intp, count=len(bases))
+        weights = np.asarray([float(b or 0) for b in bases], dtype=np.float64)
+        matched = codes >= 0
+        group_bases = np.bincount(codes[matched], weights=weights[matched], minlength=len(groups))
+        amounts = (group_bases * np.asarray([float(rates[g] or 0) for g in groups]) / 100).tolist()
+    else:
+        group_bases = [0.0] * len(groups)
+        for base, group in zip(bases, row_groups, strict=True):
+            i = index.get(group)
+            if i is not None:
+                group_bases[i] += float(base or 0)
+        amounts = [base * float(rates[g] or 0) / 100 for base, g in zip(group_bases, groups, strict=True)]
+
+    duties = {}
+    for group, amount in zip(groups, amounts, strict=True):
+        cents = to_cents(amount)
+        if cents:
+            duties[group] = cents / 100
+    return duties
@@ -0,0 +1,65 @@
+import json
+
+import frappe
+from frappe.utils import flt
+
+from my_custom_app.landed_cost.duties import get_ngp_duties
+from my_custom_app.overrides.landed_cost_voucher import compute_allocation, set_item_ngp_codes
+
+
+@frappe.whitelist()
+def preview_distribution(doc):
+    """
+    Compute the NGP-aware distribution for an unsaved Landed Cost Voucher in one round trip.
+
+    Takes the form's `doc` (only company, items, taxes, distribute_charges_based_on and
+    custom_auto_ngp_duties are read) and returns the NGP code snapshot per item row (looked up
+    for rows that have none yet), the generated duty lines (None when generation is off), the
+    charge per item row and the taxes that could not be allocated. Uses the same code path as
+    the before_validate and before_save hooks.
+    """
+    frappe.has_permission("Landed Cost Voucher", "read", throw=True)
+
+    if isinstance(doc, str):
+        doc = json.loads(doc)
+
+    voucher = frappe._dict(
+        company=doc.get("company"),
+        distribute_charges_based_on=doc.get("distribute_charges_based_on"),
+        items=[
+            frappe._dict(
+                name=row.get("name"),
+                item_code=row.get("item_code"),
+                custom_ngp_code=row.get("custom_ngp_code"),
+                amount=flt(row.get("amount")),
+                qty=flt(row.get("qty")),
+            )
+            for row in doc.get("items") or []
+        ],
+        taxes=[
+            frappe._dict(
+                idx=row.get("idx"),
+                amount=flt(row.get("amount")),
+                expense_account=row.get("expense_account"),
+                custom_ngp_code=row.get("custom_ngp_code"),
+                custom_ngp_auto=row.get("custom_ngp_auto"),
+            )
+            for row in doc.get("taxes") or []
+        ],
+    )
+
+    set_item_ngp_codes(voucher)
+    duties = None
+    if doc.get("custom_auto_ngp_duties"):
+        duties = get_ngp_duties(voucher)
+        voucher.taxes = [tax for tax in voucher.taxes if not tax.custom_ngp_auto]
+        voucher.taxes += [frappe._dict(duty) for duty in duties]
+    allocation = compute_allocation(voucher)
+
+    return {
+        "ngp_codes": {item.name: item.custom_ngp_code for item in voucher.items},
+        "duties": duties,
+        "charges": {item.name: charge for item, charge in zip(voucher.items, allocation.row_charges, strict=True)},
+        "unallocated": [voucher.taxes[i].idx for i in allocation.unallocated],
+        "total": flt(sum(allocation.row_charges), 2),
+    }
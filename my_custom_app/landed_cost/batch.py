@@ -0,0 +1,252 @@
+# Batch creation of Landed Cost Vouchers over many Purchase Receipts (month-end clearance).
+#
+# Each voucher spec lists its receipts and charges. The batch runs as one background job that
+# streams the specs through the regular voucher hooks (duty generation and NGP distribution) in
+# chunks. Before a chunk, the NGP codes and tax tables of all its items are loaded in one go, so
+# every voucher of the chunk is served from the in-process ngp_cache. Each chunk commits together
+# with the batch state (a Landed Cost Batch document and its result rows), so an interrupted batch
+# resumes after the last committed chunk without creating any voucher twice. A finished batch
+# moves its results to the cache for RESULT_TTL and its document is deleted.
+import json
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, now
+
+from my_custom_app.landed_cost.ngp_cache import get_item_ngp_codes, get_ngp_taxes
+
+CHUNK_SIZE = 20
+BATCH_DOCTYPE = "Landed Cost Batch"
+RESULT_DOCTYPE = "Landed Cost Batch Result"
+RESULT_CACHE_KEY = "my_custom_app:lcv_batch_result:"
+RESULT_TTL = 7 * 24 * 60 * 60
+EVENT = "landed_cost_batch_progress"
+
+STATE_FIELDS = ("name", "user", "submit", "total", "next_voucher", "processed", "failed", "elapsed")
+RESULT_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "parent", "parentfield", "parenttype", "idx", "voucher_index", "status", "voucher", "error",
+)
+
+CHARGE_FIELDS = ("expense_account", "description", "amount", "custom_ngp_code")
+
+
+@frappe.whitelist()
+def process_landed_costs(vouchers, submit=1):
+    """
+    Queue the creation (and by default submission) of one Landed Cost Voucher per entry of
+    `vouchers`: {"purchase_receipts": [names], "charges": [{"expense_account", "description",
+    "amount", "custom_ngp_code"}], "distribute_charges_based_on": "Amount" | "Qty"}.
+    Returns the `batch_id`; progress is published on `landed_cost_batch_progress` and can be
+    read with get_batch_progress.
+    """
+    frappe.has_permission("Landed Cost Voucher", "create", throw=True)
+    if cint(submit):
+        frappe.has_permission("Landed Cost Voucher", "submit", throw=True)
+
+    if isinstance(vouchers, str):
+        vouchers = json.loads(vouchers)
+    for i, voucher in enumerate(vouchers):
+        if not voucher.get("purchase_receipts"):
+            frappe.throw(_("Voucher {0} has no Purchase Receipts.").format(i + 1))
+
+    batch = frappe.get_doc(
+        {
+            "doctype": BATCH_DOCTYPE,
+            "user": frappe.session.user,
+            "submit": cint(submit),
+            "total": len(vouchers),
+            "vouchers": json.dumps(vouchers, default=str),
+        }
+    ).insert(ignore_permissions=True)
+    batch_id = batch.name
+    _enqueue(batch_id)
+    return batch_id
+
+
+@frappe.whitelist()
+def resume_batch(batch_id):
+    """Queue an interrupted batch again; it continues after the last committed chunk."""
+    state = _get_state(batch_id)
+    if state.next_voucher < state.total:
+        _enqueue(batch_id)
+
+
+@frappe.whitelist()
+def get_batch_progress(batch_id):
+    if frappe.db.exists(BATCH_DOCTYPE, batch_id):
+        state = _get_state(batch_id)
+        return _progress(state, _get_results(batch_id))
+
+    finished = frappe.cache().get_value(RESULT_CACHE_KEY + batch_id)
+    if not finished:
+        frappe.throw(_("Landed cost batch {0} not found").format(batch_id))
+    _check_user(finished["user"])
+    return finished["progress"]
+
+
+def _enqueue(batch_id):
+    frappe.enqueue(
+        "my_custom_app.landed_cost.batch.run_batch",
+        queue="long",
+        timeout=4 * 3600,
+        enqueue_after_commit=True,
+        job_id=f"my_custom_app:lcv_batch:{batch_id}",
+        deduplicate=True,
+        batch_id=batch_id,
+    )
+
+
+def run_batch(batch_id):
+    state = _load_state(batch_id)
+    if not state:
+        # Finished (and deleted) by an earlier run of the job
+        return
+    vouchers = json.loads(frappe.db.get_value(BATCH_DOCTYPE, batch_id, "vouchers"))
+
+    while state.next_voucher < state.total:
+        started = time.monotonic()
+        start = state.next_voucher
+        chunk = vouchers[start : start + CHUNK_SIZE]
+
+        _prefetch_ngp_lookups(chunk)
+        results = [_create_voucher(i, voucher, state.submit) for i, voucher in enumerate(chunk, start=start)]
+
+        state.next_voucher = start + len(chunk)
+        state.processed += len(results)
+        state.failed += sum(1 for result in results if result["status"] == "error")
+        state.elapsed += time.monotonic() - started
+        # The state commits with the chunk's vouchers, so a resume never repeats a chunk
+        _save_chunk(state, results)
+        frappe.db.commit()
+        frappe.publish_realtime(EVENT, _progress(state), user=state.user)
+
+    _finish(state)
+
+
+def _prefetch_ngp_lookups(chunk):
+    receipts = list({receipt for voucher in chunk for receipt in voucher["purchase_receipts"]})
+    item_codes = frappe.get_all(
+        "Purchase Receipt Item",
+        filters={"parent": ["in", receipts], "parenttype": "Purchase Receipt"},
+        pluck="item_code",
+        distinct=True,
+    )
+    get_ngp_taxes(set(get_item_ngp_codes(item_codes).values()))
+
+
+def _create_voucher(i, voucher, submit):
+    savepoint = f"lcv_batch_{i}"
+    frappe.db.savepoint(savepoint)
+    try:
+        doc = frappe.new_doc("Landed Cost Voucher")
+        receipts = frappe.get_all(
+            "Purchase Receipt",
+            filters={"name": ["in", voucher["purchase_receipts"]], "docstatus": 1},
+            fields=["name", "company", "supplier", "base_grand_total", "posting_date"],
+        )
+        missing = set(voucher["purchase_receipts"]) - {receipt.name for receipt in receipts}
+        if missing:
+            frappe.throw(_("Purchase Receipts not found or not submitted: {0}").format(", ".join(sorted(missing))))
+
+        doc.company = voucher.get("company") or receipts[0].company
+        doc.distribute_charges_based_on = voucher.get("distribute_charges_based_on") or "Amount"
+        for receipt in receipts:
+            doc.append(
+                "purchase_receipts",
+                {
+                    "receipt_document_type": "Purchase Receipt",
+                    "receipt_document": receipt.name,
+                    "supplier": receipt.supplier,
+                    "grand_total": receipt.base_grand_total,
+                    "posting_date": receipt.posting_date,
+                },
+            )
+        doc.get_items_from_purchase_receipts()
+        for charge in voucher.get("charges") or []:
+            doc.append("taxes", {field: charge.get(field) for field in CHARGE_FIELDS})
+
+        doc.insert()
+        if submit:
+            doc.submit()
+        return {"index": i, "status": "submitted" if submit else "created", "name": doc.name, "error": None}
+    except Exception as e:
+        frappe.db.rollback(save_point=savepoint)
+        frappe.clear_messages()
+        return {"index": i, "status": "error", "name": None, "error": str(e)}
+
+
+def _progress(state, results=None):
+    progress = {
+        "batch_id": state.name,
+        "total": state.total,
+        "processed": state.processed,
+        "failed": state.failed,
+        "vouchers_per_minute": flt(60 * state.processed / state.elapsed, 1) if state.elapsed else 0,
+    }
+    if results is not None:
+        progress["results"] = results
+    return progress
+
+
+def _load_state(batch_id):
+    return frappe.db.get_value(BATCH_DOCTYPE, batch_id, STATE_FIELDS, as_dict=True)
+
+
+def _get_state(batch_id):
+    state = _load_state(batch_id)
+    if not state:
+        frappe.throw(_("Landed cost batch {0} not found").format(batch_id))
+    _check_user(state.user)
+    return state
+
+
+def _check_user(user):
+    if user != frappe.session.user and frappe.session.user != "Administrator":
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+
+def _get_results(batch_id):
+    return [
+        {"index": row.voucher_index, "status": row.status, "name": row.voucher, "error": row.error}
+        for row in frappe.get_all(
+            RESULT_DOCTYPE,
+            filters={"parent": batch_id, "parenttype": BATCH_DOCTYPE},
+            fields=["voucher_index", "status", "voucher", "error"],
+            order_by="idx",
+        )
+    ]
+
+
+def _save_chunk(state, results):
+    # Result rows are appended with one insert per chunk instead of re-saving the whole document
+    timestamp, user = now(), frappe.session.user
+    frappe.db.bulk_insert(
+        RESULT_DOCTYPE,
+        RESULT_FIELDS,
+        [
+            (
+                frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+                state.name, "results", BATCH_DOCTYPE, result["index"] + 1,
+                result["index"], result["status"], result["name"], result["error"],
+            )
+            for result in results
+        ],
+    )
+    frappe.db.set_value(
+        BATCH_DOCTYPE,
+        state.name,
+        {field: state[field] for field in ("next_voucher", "processed", "failed", "elapsed")},
+        update_modified=False,
+    )
+
+
+def _finish(state):
+    frappe.cache().set_value(
+        RESULT_CACHE_KEY + state.name,
+        {"user": state.user, "progress": _progress(state, _get_results(state.name))},
+        expires_in_sec=RESULT_TTL,
+    )
+    frappe.delete_doc(BATCH_DOCTYPE, state.name, ignore_permissions=True, force=True)
+    frappe.db.commit()
@@ -0,0 +1,77 @@
+# Opt-in tracing for the landed cost distribution.
+#
+# Enable for the whole site with `bench --site <site> set-config my_custom_app_lcv_debug 1`
+# or for the current user through `set_debug_mode`. When disabled nothing is recorded.
+import time
+from contextlib import contextmanager, nullcontext
+
+import frappe
+from frappe.utils import cint, now
+
+DEBUG_CONFIG_KEY = "my_custom_app_lcv_debug"
+TRACE_CACHE_KEY = "my_custom_app:lcv_trace:"
+TRACE_TTL = 60 * 60
+
+
+def is_debug_enabled():
+    return bool(cint(frappe.conf.get(DEBUG_CONFIG_KEY)) or cint(frappe.defaults.get_user_default(DEBUG_CONFIG_KEY)))
+
+
+class AllocationTrace:
+    """Structured record of one distribution run: per-phase timings, per-charge detail and totals."""
+
+    def __init__(self, voucher):
+        self.data = {
+            "voucher": voucher,
+            "user": frappe.session.user,
+            "timestamp": now(),
+            "phases": {},
+            "taxes": [],
+            "totals": {},
+        }
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.data["phases"][name] = round((time.perf_counter() - start) * 1000, 3)
+
+    def add_tax(self, tax, ngp_code, shares):
+        self.data["taxes"].append(
+            {
+                "idx": tax.idx,
+                "amount": tax.amount,
+                "expense_account": tax.expense_account,
+                "ngp_code": ngp_code,
+                "allocated": bool(shares),
+                "shares": shares,
+            }
+        )
+
+    def save(self):
+        frappe.cache().set_value(
+            TRACE_CACHE_KEY + f"{self.data['user']}:{self.data['voucher']}",
+            self.data,
+            expires_in_sec=TRACE_TTL,
+        )
+
+
+def phase(trace, name):
+    """`trace.phase(name)` when tracing, a no-op context otherwise."""
+    return trace.phase(name) if trace else nullcontext()
+
+
+@frappe.whitelist()
+def get_allocation_trace(voucher):
+    """Return the last trace recorded by the current user for `voucher`, if any."""
+    frappe.has_permission("Landed Cost Voucher", "read", voucher, throw=True)
+    return frappe.cache().get_value(TRACE_CACHE_KEY + f"{frappe.session.user}:{voucher}")
+
+
+@frappe.whitelist()
+def set_debug_mode(enabled):
+    """Turn landed cost tracing on or off for the current user."""
+    frappe.defaults.set_user_default(DEBUG_CONFIG_KEY, 1 if cint(enabled) else 0)
+    return is_debug_enabled()
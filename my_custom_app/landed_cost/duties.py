@@ -0,0 +1,82 @@
+# Automatic NGP duty lines on Landed Cost Vouchers.
+#
+# One line per NGP code present on the voucher: the summed amount of its items times the summed
+# rates of the code's NGP Taxes table. Generated lines are flagged custom_ngp_auto and rebuilt
+# on every save; an NGP code that already has a hand-entered line is left alone. The lines are
+# ordinary NGP taxes, so custom_distribute_charges_by_ngp then spreads each one over its items.
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.landed_cost.allocation import compute_duties
+from my_custom_app.landed_cost.ngp_cache import get_ngp_taxes
+
+
+@instrumented
+def set_ngp_duties(doc, method=None):
+    """
+    Landed Cost Voucher before_validate: replace the generated duty lines, so ERPNext's own
+    validation already totals them.
+    """
+    if doc.docstatus != 0 or not doc.get("custom_auto_ngp_duties"):
+        return
+
+    duties = get_ngp_duties(doc)
+
+    current = [tax for tax in doc.taxes if tax.get("custom_ngp_auto")]
+    if [_duty_key(tax) for tax in current] == [_duty_key(duty) for duty in duties]:
+        return
+
+    doc.taxes = [tax for tax in doc.taxes if not tax.get("custom_ngp_auto")]
+    for duty in duties:
+        doc.append("taxes", duty)
+    for idx, tax in enumerate(doc.taxes, start=1):
+        tax.idx = idx
+
+
+def get_ngp_duties(doc):
+    """
+    Duty lines for `doc` (items with amount and their NGP code snapshot, taxes, company) as a
+    list of dicts ready to append to its taxes, ordered by NGP code.
+    """
+    manual = {tax.custom_ngp_code for tax in doc.taxes if tax.get("custom_ngp_code") and not tax.get("custom_ngp_auto")}
+    row_codes = [item.get("custom_ngp_code") for item in doc.items]
+    codes = set(filter(None, row_codes)) - manual
+    if not codes:
+        return []
+
+    ngp_taxes = get_ngp_taxes(codes)
+    rates = {code: sum(flt(row["tax_rate"]) for row in rows) for code, rows in ngp_taxes.items() if rows}
+    amounts = compute_duties(
+        [item.amount for item in doc.items],
+        row_codes,
+        rates,
+    )
+    if not amounts:
+        return []
+
+    account = frappe.get_cached_value("Company", doc.company, "custom_ngp_duty_account")
+    if not account:
+        # Not configured yet: keep the voucher saveable, the lines can still be typed by hand
+        frappe.msgprint(
+            _("NGP duties were not generated: set the NGP Duty Account of company {0}.").format(doc.company),
+            indicator="orange",
+            alert=True,
+        )
+        return []
+
+    return [
+        {
+            "expense_account": account,
+            "custom_ngp_code": code,
+            "custom_ngp_auto": 1,
+            "description": f"{code}: " + ", ".join(row["tax_type"] or row["name1"] or "" for row in ngp_taxes[code]),
+            "amount": amounts[code],
+        }
+        for code in sorted(amounts)
+    ]
+
+
+def _duty_key(tax):
+    return (tax.get("custom_ngp_code"), tax.get("expense_account"), flt(tax.get("amount"), 2))
@@ -0,0 +1,220 @@
+# Site-wide cache for NGP lookups: item_code -> custom_ngp_code and ngp_code -> NGP Taxes rows.
+#
+# Two levels: a small in-process LRU in front of Redis hashes in the frappe cache. Writes to
+# Item / NGP Code (see doc_events in hooks.py) drop the affected Redis entries and rotate a
+# generation token once their transaction commits. The token is read from Redis once per request
+# (or background job) and each process clears its LRU when it sees a new one, so changes made by
+# other processes show up from their next request on. Hit/miss counters go out in one pipeline
+# per lookup.
+from collections import OrderedDict
+
+import frappe
+
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.utils import get_commit_batch, get_counters, get_hash_values
+
+ITEM_NGP_KEY = "my_custom_app:item_ngp_code"
+NGP_TAXES_KEY = "my_custom_app:ngp_taxes"
+GENERATION_KEY = "my_custom_app:ngp_cache_generation"
+STATS_KEY = "my_custom_app:ngp_cache_stats"
+
+LRU_SIZE = 20000
+
+# Stored for items without an NGP code, so they are not looked up again
+NO_CODE = ""
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.generation = None
+
+    def get(self, key, default=None):
+        try:
+            self.data.move_to_end(key)
+        except KeyError:
+            return default
+        return self.data[key]
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def check_generation(self, generation):
+        if generation != self.generation:
+            self.data.clear()
+            self.generation = generation
+
+
+_local_caches = {ITEM_NGP_KEY: LRUCache(LRU_SIZE), NGP_TAXES_KEY: LRUCache(LRU_SIZE)}
+
+
+def get_item_ngp_codes(item_codes):
+    """Return {item_code: custom_ngp_code} for items that have an NGP code."""
+    codes = _get_many(ITEM_NGP_KEY, item_codes, _load_item_ngp_codes)
+    return {item_code: code for item_code, code in codes.items() if code}
+
+
+def get_ngp_taxes(ngp_codes):
+    """Return {ngp_code: [{"name1", "tax_type", "tax_rate"}, ...]} from the NGP Code tax tables."""
+    return _get_many(NGP_TAXES_KEY, ngp_codes, _load_ngp_taxes)
+
+
+def _get_many(key, names, loader):
+    names = list({name for name in names if name})
+    if not names:
+        return {}
+
+    lru = _local_caches[key]
+    lru.check_generation(_get_generation())
+
+    result = {}
+    missing = []
+    for name in names:
+        value = lru.get(name)
+        if value is None:
+            missing.append(name)
+        else:
+            result[name] = value
+    stats = {"lru_hits": len(result)}
+
+    if missing:
+        # One HMGET for every name the LRU did not have
+        values, still_missing = get_hash_values(key, missing, loader)
+        for name, value in values.items():
+            lru.set(name, value)
+        result.update(values)
+        stats["redis_hits"] = len(missing) - len(still_missing)
+        stats["misses"] = len(still_missing)
+
+    _record_stats(key, stats)
+    return result
+
+
+def _load_item_ngp_codes(item_codes):
+    return {
+        name: code or NO_CODE
+        for name, code in frappe.get_all(
+            "Item",
+            filters={"name": ["in", item_codes]},
+            fields=["name", "custom_ngp_code"],
+            as_list=True,
+        )
+    }
+
+
+def _load_ngp_taxes(ngp_codes):
+    taxes = {code: [] for code in ngp_codes}
+    for row in frappe.get_all(
+        "NGP Taxes",
+        filters={"parent": ["in", ngp_codes], "parenttype": "NGP Code"},
+        fields=["parent", "name1", "tax_type", "tax_rate"],
+        order_by="parent, idx",
+    ):
+        taxes[row.pop("parent")].append(row)
+    return taxes
+
+
+def _record_stats(key, stats):
+    cache = frappe.cache()
+    stats_key = cache.make_key(STATS_KEY)
+    pipe = cache.pipeline()
+    for counter, value in stats.items():
+        if value:
+            pipe.hincrby(stats_key, f"{key.rsplit(':', 1)[-1]}:{counter}", value)
+    pipe.execute()
+
+
+@frappe.whitelist()
+def get_cache_stats():
+    """Hit/miss counters since the last reset, per cache."""
+    frappe.only_for("System Manager")
+    return get_counters(STATS_KEY)
+
+
+@frappe.whitelist()
+def reset_cache_stats():
+    frappe.only_for("System Manager")
+    frappe.cache().delete_value(STATS_KEY)
+
+
+def clear_cache():
+    frappe.cache().delete_value([ITEM_NGP_KEY, NGP_TAXES_KEY])
+    _bump_generation()
+
+
+def _invalidate(key, names=None):
+    """
+    Drop `names` (every entry when None) from the `key` hash once the current transaction
+    commits. Dropping them earlier would let another worker re-cache the old committed value in
+    between, and the hashes have no TTL.
+    """
+    pending = get_commit_batch("ngp_cache", _flush_invalidations)
+    if names is None:
+        pending[key] = None
+    elif pending.get(key, ()) is not None:
+        pending.setdefault(key, set()).update(name for name in names if name)
+
+
+def _flush_invalidations(pending):
+    cache = frappe.cache()
+    for key, names in pending.items():
+        if names is None:
+            cache.delete_value(key)
+        elif names:
+            cache.hdel(key, list(names))
+    _bump_generation()
+
+
+def _get_generation():
+    generation = getattr(frappe.local, "ngp_cache_generation", None)
+    if generation is None:
+        generation = frappe.local.ngp_cache_generation = frappe.cache().get_value(GENERATION_KEY) or ""
+    return generation
+
+
+def _bump_generation():
+    # This process sees its own changes right away, others from their next request
+    generation = frappe.generate_hash(length=10)
+    frappe.cache().set_value(GENERATION_KEY, generation)
+    frappe.local.ngp_cache_generation = generation
+
+
+# Document events (see hooks.py)
+
+
+@instrumented
+def on_item_update(doc, method=None):
+    if doc.has_value_changed("custom_ngp_code"):
+        _invalidate(ITEM_NGP_KEY, [doc.name])
+
+
+@instrumented
+def on_item_rename(doc, method=None, old=None, new=None, merge=False):
+    _invalidate(ITEM_NGP_KEY, [old, new])
+
+
+@instrumented
+def on_item_trash(doc, method=None):
+    _invalidate(ITEM_NGP_KEY, [doc.name])
+
+
+@instrumented
+def on_ngp_code_update(doc, method=None):
+    _invalidate(NGP_TAXES_KEY, [doc.name])
+
+
+@instrumented
+def on_ngp_code_rename(doc, method=None, old=None, new=None, merge=False):
+    # Renaming rewrites Item.custom_ngp_code directly in the database without Item
+    # events, so every cached item mapping may be stale
+    _invalidate(ITEM_NGP_KEY)
+    _invalidate(NGP_TAXES_KEY, [old, new])
+
+
+@instrumented
+def on_ngp_code_trash(doc, method=None):
+    _invalidate(NGP_TAXES_KEY, [doc.name])
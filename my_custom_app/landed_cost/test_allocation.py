@@ -0,0 +1,73 @@
+# Unit tests for the allocation engine. It does not touch frappe, so these also run without a
+# site: python -m unittest my_custom_app.landed_cost.test_allocation
+import random
+import unittest
+from unittest.mock import patch
+
+from my_custom_app.landed_cost import allocation
+from my_custom_app.landed_cost.allocation import allocate, to_cents
+
+
+def total_cents(row_charges):
+    return sum(to_cents(charge) for charge in row_charges)
+
+
+class TestAllocate(unittest.TestCase):
+    def test_charges_are_distributed_to_the_cent(self):
+        result = allocate([1, 1, 1], [100.00, 0.01, 33.33])
+        self.assertEqual(total_cents(result.row_charges), 13334)
+        self.assertEqual(result.row_charges, [44.46, 44.44, 44.44])
+        self.assertEqual(result.unallocated, [])
+
+    def test_random_totals_match_the_charges(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            bases = [rng.choice([0, rng.uniform(0.01, 5000)]) for _ in range(rng.randint(1, 40))]
+            bases[0] = bases[0] or 1
+            charges = [round(rng.uniform(0.01, 20000), 2) for _ in range(rng.randint(1, 5))]
+            result = allocate(bases, charges)
+            self.assertEqual(total_cents(result.row_charges), sum(to_cents(c) for c in charges))
+
+    def test_negative_charges(self):
+        result = allocate([2, 1], [-10.00, 3.00])
+        self.assertEqual(total_cents(result.row_charges), -700)
+        self.assertEqual(result.row_charges, [-4.67, -2.33])
+
+    def test_negative_bases_are_not_allocated(self):
+        result = allocate([-5, 5], [10.00])
+        self.assertEqual(result.row_charges, [0.0, 0.0])
+        self.assertEqual(result.unallocated, [0])
+
+    def test_grouped_charges_only_reach_their_rows(self):
+        result = allocate(
+            [100, 300, 600], [10.00, 5.00], row_groups=["A", "B", "A"], charge_groups=["A", None]
+        )
+        self.assertEqual(result.row_charges, [1.93, 1.5, 11.57])
+        self.assertEqual(total_cents(result.row_charges), 1500)
+
+    def test_charge_without_rows_is_unallocated(self):
+        result = allocate([1, 2], [4.00, 9.00], row_groups=["A", "A"], charge_groups=["A", "B"])
+        self.assertEqual(result.unallocated, [1])
+        self.assertEqual(total_cents(result.row_charges), 400)
+
+    def test_leftover_cents_go_to_the_largest_remainders(self):
+        # 1.00 over 3/8, 1/8, 1/8, 1/8, 2/8: equal remainders are broken in row order
+        result = allocate([3, 1, 1, 1, 2], [1.00])
+        self.assertEqual(result.row_charges, [0.38, 0.13, 0.12, 0.12, 0.25])
+
+
+@unittest.skipIf(allocation.np is None, "numpy is not installed")
+class TestBackendParity(unittest.TestCase):
+    def test_numpy_and_python_agree(self):
+        rng = random.Random(11)
+        for _ in range(200):
+            n_rows = rng.randint(1, 60)
+            groups = [rng.choice(["A", "B", "C", None]) for _ in range(n_rows)]
+            bases = [rng.choice([0, 1, 1, round(rng.uniform(0.01, 900), 2)]) for _ in range(n_rows)]
+            charges = [round(rng.uniform(-500, 5000), 2) for _ in range(rng.randint(1, 6))]
+            charge_groups = [rng.choice(["A", "B", "D", None]) for _ in charges]
+
+            with_numpy = allocate(bases, charges, groups, charge_groups, detail=True)
+            with patch.object(allocation, "np", None):
+                with_python = allocate(bases, charges, groups, charge_groups, detail=True)
+            self.assertEqual(with_numpy, with_python)
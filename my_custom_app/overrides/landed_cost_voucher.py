@@ -1,146 +1,130 @@
+import hashlib
+import json
+
 import frappe
 from frappe import _
+from frappe.utils import flt
+
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.landed_cost.allocation import allocate, to_cents
+from my_custom_app.landed_cost.debug import AllocationTrace, is_debug_enabled, phase
+from my_custom_app.landed_cost.ngp_cache import get_item_ngp_codes
+
+ALLOCATION_CACHE_KEY = "my_custom_app:lcv_allocation:"
+ALLOCATION_CACHE_TTL = 24 * 60 * 60
+
+
+@instrumented
+def set_item_ngp_codes(doc, method=None):
+    """
+    Landed Cost Voucher before_validate: snapshot the NGP code of each item on its row (one lookup
+    for every row that has none yet). The distribution only reads the snapshot, so reclassifying
+    an Item later does not change vouchers that already carry its code.
+    """
+    missing = [item for item in doc.items if not item.get("custom_ngp_code")]
+    if not missing:
+        return
+
+    item_ngp_codes = get_item_ngp_codes([item.item_code for item in missing])
+    for item in missing:
+        item.custom_ngp_code = item_ngp_codes.get(item.item_code)
+
 
+@instrumented
 def custom_distribute_charges_by_ngp(doc, method=None):
     """
     Custom method to distribute landed cost based on NGP codes
-    To be called from hooks.py before_validate for Landed Cost Voucher
+    To be called from hooks.py before_save / before_submit for Landed Cost Voucher
+    """
+    # Trace structurée uniquement en mode debug (site ou utilisateur), consultable via
+    # my_custom_app.landed_cost.debug.get_allocation_trace
+    trace = AllocationTrace(doc.name) if is_debug_enabled() else None
+
+    # Le hash couvre les codes NGP des lignes : on les fige d'abord, before_validate ne
+    # tourne pas quand la sauvegarde ignore la validation (flags.ignore_validate)
+    set_item_ngp_codes(doc)
+
+    # Entrées inchangées depuis le dernier calcul (ex. before_save puis before_submit) :
+    # on réapplique le résultat mémorisé sans recharger les articles
+    fingerprint = get_allocation_fingerprint(doc)
+    cached_charges = None
+    if doc.get("custom_allocation_fingerprint") == fingerprint:
+        cached_charges = frappe.cache().get_value(ALLOCATION_CACHE_KEY + fingerprint)
+
+    if cached_charges is not None and len(cached_charges) == len(doc.items):
+        with phase(trace, "cache"):
+            for item, charge in zip(doc.items, cached_charges, strict=True):
+                item.applicable_charges = charge
+    else:
+        allocation = compute_allocation(doc, trace)
+        doc.custom_allocation_fingerprint = fingerprint
+        frappe.cache().set_value(
+            ALLOCATION_CACHE_KEY + fingerprint,
+            allocation.row_charges,
+            expires_in_sec=ALLOCATION_CACHE_TTL,
+        )
+
+    if trace:
+        with trace.phase("totals"):
+            # Calculer les totaux : valeur initiale, charges, valeur finale
+            original_stock_value = sum(flt(item.amount) for item in doc.items)
+            total_applied_charges = sum(flt(item.applicable_charges) for item in doc.items)
+            trace.data["totals"] = {
+                "original_stock_value": flt(original_stock_value, 2),
+                "total_applied_charges": flt(total_applied_charges, 2),
+                "final_value": flt(original_stock_value + total_applied_charges, 2),
+            }
+        trace.data["cached"] = cached_charges is not None
+        trace.save()
+
+
+def compute_allocation(doc, trace=None):
+    """
+    Run the NGP-aware distribution on `doc` and set applicable_charges on its items.
+    `doc` only needs the voucher fields (items with their NGP code snapshot, taxes,
+    distribute_charges_based_on), so the form preview can pass plain dicts.
+    """
+    is_amount_based = doc.distribute_charges_based_on == "Amount"
+
+    # Répartition par le moteur commun (centimes entiers, plus forts restes)
+    with phase(trace, "allocation"):
+        bases = [(item.amount if is_amount_based else item.qty) for item in doc.items]
+        row_groups = [item.get("custom_ngp_code") for item in doc.items]
+        charge_groups = [(tax.custom_ngp_code if is_ngp_tax(tax) else None) for tax in doc.taxes]
+        allocation = allocate(
+            bases, [tax.amount for tax in doc.taxes], row_groups, charge_groups, detail=bool(trace)
+        )
+
+        for item, charge in zip(doc.items, allocation.row_charges, strict=True):
+            item.applicable_charges = charge
+
+    if trace:
+        for tax, ngp_code, shares in zip(doc.taxes, charge_groups, allocation.details, strict=True):
+            trace.add_tax(tax, ngp_code, [(doc.items[row].item_code, charge) for row, charge in shares])
+
+    return allocation
+
+
+def get_allocation_fingerprint(doc):
     """
-    # Réinitialiser les charges applicables
-    for item in doc.items:
-        item.applicable_charges = 0
-
-    # Calculer les totaux initiaux
-    original_stock_value = 0
-    for item in doc.items:
-        original_stock_value = original_stock_value + item.amount
-
-    all_debug_messages = []
-
-    # Traiter séparément les taxes NGP et non-NGP
-    for tax in doc.taxes:
-        current_amount = tax.amount
-        
-        if tax.expense_account and "ngp" in tax.expense_account.lower() and tax.custom_ngp_code:
-            # Traitement des taxes NGP
-            current_ngp_code = tax.custom_ngp_code
-            
-            all_debug_messages.append("=== TRAITEMENT TAXE NGP ===")
-            all_debug_messages.append(f"Code NGP: {current_ngp_code}")
-            all_debug_messages.append(f"Montant: {current_amount}")
-            all_debug_messages.append(f"Compte: {tax.expense_account}")
-            
-            # Identifier les articles avec ce code NGP
-            items_with_ngp = []
-            for item in doc.items:
-                try:
-                    item_doc = frappe.get_doc("Item", item.item_code)
-                    if item_doc.get("custom_ngp_code") == current_ngp_code:
-                        items_with_ngp.append(item)
-                        all_debug_messages.append(f"Article trouvé avec NGP: {item.item_code}")
-                except Exception:
-                    pass
-
-            # Si aucun article NGP trouvé, on passe à la taxe suivante
-            if not items_with_ngp:
-                all_debug_messages.append(f"Aucun article trouvé pour le code NGP {current_ngp_code}")
-                continue
-
-            # Distribution uniquement aux articles NGP
-            distribution_base = 0
-            is_amount_based = doc.distribute_charges_based_on == "Amount"
-            
-            # Calculer la base de distribution
-            for item in items_with_ngp:
-                if is_amount_based:
-                    distribution_base = distribution_base + item.amount
-                else:
-                    distribution_base = distribution_base + item.qty
-
-            if distribution_base == 0:
-                continue
-
-            # Distribution proportionnelle aux articles NGP
-            total_distributed = 0
-            last_item = items_with_ngp[-1]
-
-            for item in items_with_ngp:
-                if item == last_item:
-                    # Pour le dernier article, on attribue le reste pour éviter les écarts d'arrondi
-                    charge = current_amount - total_distributed
-                else:
-                    if is_amount_based:
-                        proportion = item.amount / distribution_base
-                    else:
-                        proportion = item.qty / distribution_base
-                    charge = round(proportion * current_amount, 2)
-                    total_distributed = total_distributed + charge
-
-                item.applicable_charges = item.applicable_charges + charge
-                all_debug_messages.append(f"Répartition NGP pour {item.item_code}: {charge}")
-                
-        else:
-            # Traitement standard pour les taxes non-NGP
-            all_debug_messages.append("=== TRAITEMENT TAXE STANDARD ===")
-            all_debug_messages.append(f"Montant: {current_amount}")
-            all_debug_messages.append(f"Compte: {tax.expense_account}")
-            
-            # Distribution standard pour toutes les lignes
-            distribution_base = 0
-            is_amount_based = doc.distribute_charges_based_on == "Amount"
-            
-            # Calculer la base totale
-            for item in doc.items:
-                if is_amount_based:
-                    distribution_base = distribution_base + item.amount
-                else:
-                    distribution_base = distribution_base + item.qty
-
-            # Distribution proportionnelle
-            total_distributed = 0
-            last_item = doc.items[-1]
-
-            for item in doc.items:
-                if item == last_item:
-                    # Pour le dernier article, on attribue le reste
-                    charge = current_amount - total_distributed
-                else:
-                    if is_amount_based:
-                        proportion = item.amount / distribution_base
-                    else:
-                        proportion = item.qty / distribution_base
-                    charge = round(proportion * current_amount, 2)
-                    total_distributed = total_distributed + charge
-
-                item.applicable_charges = item.applicable_charges + charge
-                all_debug_messages.append(f"Répartition standard pour {item.item_code}: {charge}")
-
-    # Calculer les totaux finaux
-    total_applied_charges = 0
-    final_value = 0
-    for item in doc.items:
-        total_applied_charges = total_applied_charges + item.applicable_charges
-        final_value = final_value + item.amount + item.applicable_charges
-
-    # Afficher les résultats
-    frappe.msgprint(
-        f"""=== VÉRIFICATION FINALE ===
-Valeur initiale: {round(original_stock_value, 2)}
-Charges totales: {round(total_applied_charges, 2)}
-Valeur finale: {round(final_value, 2)}""",
-        title='Débug Final'
-    )
-
-    if all_debug_messages:
-        frappe.msgprint("\n".join(all_debug_messages), title='Détails de calcul')
-
-    frappe.msgprint(
-        f"""=== ÉCRITURES COMPTABLES PRÉVUES ===
-DÉBIT:
-- Stock: {round(final_value, 2)}
-
-CRÉDIT:
-- Charges: {round(total_applied_charges, 2)}
-- Stock initial: {round(original_stock_value, 2)}""",
-        title='Écritures Comptables'
-    ) 
\ No newline at end of file
+    Hash of every input the distribution depends on: rows with their NGP code snapshot, charges,
+    accounts, NGP codes and basis. Reclassifying an Item does not change the hash of a row that
+    already carries its code, just as it does not change the distribution.
+    """
+    payload = [
+        doc.distribute_charges_based_on,
+        [(item.item_code, item.get("custom_ngp_code"), to_cents(item.amount), flt(item.qty)) for item in doc.items],
+        [(to_cents(tax.amount), tax.expense_account, tax.get("custom_ngp_code")) for tax in doc.taxes],
+    ]
+    return hashlib.sha1(json.dumps(payload, default=str).encode()).hexdigest()
+
+
+def is_ngp_tax(tax):
+    """
+    NGP duties carry the NGP code they apply to and are either generated (see duties.py) or
+    charged on an NGP expense account.
+    """
+    if not tax.get("custom_ngp_code"):
+        return False
+    return bool(tax.get("custom_ngp_auto") or (tax.expense_account and "ngp" in tax.expense_account.lower()))
+
@@ -3,6 +3,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate
 
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.visits.periods import set_missing_period_dates
+
+@instrumented
 def check_visit_target_details(doc, method):
     # This function will be called by the before_save hook on Sales Person
     child_table_fieldname = "custom_number_visit_target" # Confirmed fieldname
@@ -11,65 +15,93 @@ def check_visit_target_details(doc, method):
     if not visit_targets:
         return # No rows to validate
 
-    # --- Validation Loop --- 
-    for i, row1 in enumerate(visit_targets):
-        # --- Existing Validation: Customer/Territory --- 
-        customer1 = row1.get("customer")
-        territory1 = row1.get("territory")
+    # --- Row Validation: parse dates once per row and bucket rows for the overlap check ---
+    # key: ("Customer", name) or ("Territory", name) -> [(start_date, end_date, row_number)]
+    ranges_by_target = {}
+
+    for i, row in enumerate(visit_targets):
+        # --- Existing Validation: Customer/Territory ---
+        customer = row.get("customer")
+        territory = row.get("territory")
 
-        if not customer1 and not territory1:
+        if not customer and not territory:
             frappe.throw(
                 _("Row #{}: Please specify either a Customer or a Territory in Visit Target Details. One of them is required.").format(i + 1),
                 title=_("Missing Information in Visit Target Details")
             )
 
-        # --- Existing Validation: Period Dates --- 
-        period_type1 = row1.get("period_type")
-        start_date1_str = row1.get("start_date")
-        end_date1_str = row1.get("end_date")
+        # --- Existing Validation: Period Dates ---
+        # Rows from import/API never went through the form script: resolve their period server-side
+        set_missing_period_dates(row)
+        period_type = row.get("period_type")
+        start_date_str = row.get("start_date")
+        end_date_str = row.get("end_date")
 
-        if period_type1 == "Custom Range":
-            if not start_date1_str or not end_date1_str:
-                frappe.throw(
-                    _("Row #{}: Start Date and End Date are required when Period Type is 'Custom Range'.").format(i + 1),
-                    title=_("Missing Date Information")
-                )
-            else:
-                start_date1 = getdate(start_date1_str)
-                end_date1 = getdate(end_date1_str)
-                if end_date1 < start_date1:
-                    frappe.throw(
-                        _("Row #{}: End Date cannot be before Start Date.").format(i + 1),
-                        title=_("Invalid Date Range")
+        if period_type == "Custom Range" and (not start_date_str or not end_date_str):
+            frappe.throw(
+                _("Row #{}: Start Date and End Date are required when Period Type is 'Custom Range'.").format(i + 1),
+                title=_("Missing Date Information")
+            )
+
+        if not start_date_str or not end_date_str:
+            # Only rows without a period type can still lack dates: skip overlap check for them
+            continue
+
+        start_date = getdate(start_date_str)
+        end_date = getdate(end_date_str)
+        if period_type == "Custom Range" and end_date < start_date:
+            frappe.throw(
+                _("Row #{}: End Date cannot be before Start Date.").format(i + 1),
+                title=_("Invalid Date Range")
+            )
+
+        # Customer targets are compared per customer, territory-only targets per territory
+        key = ("Customer", customer) if customer else ("Territory", territory)
+        ranges_by_target.setdefault(key, []).append((start_date, end_date, i + 1))
+
+    # --- Overlap Validation: sort and sweep each group, O(n log n) overall ---
+    conflicts = []
+    for (target_type, target), ranges in ranges_by_target.items():
+        if len(ranges) < 2:
+            continue
+
+        ranges.sort()
+        # Row whose range reaches furthest so far; any later row starting on or before
+        # its end overlaps it: (StartA <= EndB) and (EndA >= StartB)
+        _start, furthest_end, furthest_row = ranges[0]
+        for start_date, end_date, row_number in ranges[1:]:
+            if start_date <= furthest_end:
+                conflicts.append(
+                    _("Row #{row1} and Row #{row2} overlap for {target_type} {target}.").format(
+                        row1=min(furthest_row, row_number),
+                        row2=max(furthest_row, row_number),
+                        target_type=_(target_type),
+                        target=target
                     )
-        elif start_date1_str and end_date1_str: # Ensure dates exist for comparison even if not Custom
-             start_date1 = getdate(start_date1_str)
-             end_date1 = getdate(end_date1_str)
-        else:
-             # If dates are missing for non-custom types, skip overlap check for this row
-             continue 
-
-        # --- New Validation: Check for Overlaps with Other Rows --- 
-        for j, row2 in enumerate(visit_targets):
-            if i == j: # Don't compare a row with itself
-                continue
-
-            customer2 = row2.get("customer")
-            start_date2_str = row2.get("start_date")
-            end_date2_str = row2.get("end_date")
-
-            # Only compare if customers match and are not empty, and both rows have valid dates
-            if customer1 and customer1 == customer2 and start_date2_str and end_date2_str:
-                start_date2 = getdate(start_date2_str)
-                end_date2 = getdate(end_date2_str)
-
-                # Check for overlap: (StartA <= EndB) and (EndA >= StartB)
-                if (start_date1 <= end_date2) and (end_date1 >= start_date2):
-                    frappe.throw(
-                        _("Overlap detected between Row #{row1} and Row #{row2} for Customer {customer}. Please ensure date ranges do not overlap for the same customer.").format(
-                            row1=i + 1,
-                            row2=j + 1,
-                            customer=customer1
-                        ),
-                        title=_("Overlapping Visit Target Dates")
-                    )
\ No newline at end of file
+                )
+            if end_date > furthest_end:
+                furthest_end, furthest_row = end_date, row_number
+
+    if conflicts:
+        conflicts.append(_("Please ensure date ranges do not overlap for the same customer or territory."))
+        frappe.throw(conflicts, title=_("Overlapping Visit Target Dates"), as_list=True)
+
+
+@instrumented
+def keep_completed_visits(doc, method):
+    # completed_visits is maintained in the database by Sales Visit Log submit/cancel, so a
+    # form opened before a visit was logged must not write its stale counts back
+    if doc.is_new():
+        return
+
+    current_counts = dict(
+        frappe.get_all(
+            "Visit Target Detail",
+            filters={"parenttype": "Sales Person", "parent": doc.name},
+            fields=["name", "completed_visits"],
+            as_list=True,
+        )
+    )
+    for row in doc.get("custom_number_visit_target") or []:
+        if row.name in current_counts:
+            row.completed_visits = current_counts[row.name]
@@ -0,0 +1,16 @@
+# Snapshot the customer territory on existing Sales Visit Logs (new ones fetch it on save), then
+# build the daily visit rollup from every submitted log.
+import frappe
+
+from my_custom_app.visits.rollup import run_rebuild
+
+
+def execute():
+    frappe.db.sql(
+        """
+        update `tabSales Visit Log` svl
+        set territory = (select customer.territory from `tabCustomer` customer where customer.name = svl.customer)
+        where coalesce(svl.territory, '') = ''
+        """
+    )
+    run_rebuild()
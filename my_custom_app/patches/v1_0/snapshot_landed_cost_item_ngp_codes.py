@@ -0,0 +1,23 @@
+# Fill Landed Cost Item.custom_ngp_code on existing vouchers from the items' current NGP codes,
+# in one UPDATE. Rows that already carry a snapshot are left alone.
+import frappe
+from frappe.utils.fixtures import sync_fixtures
+
+
+def execute():
+    # Custom field fixtures are synced after the patches run on the first migrate
+    if not frappe.db.has_column("Landed Cost Item", "custom_ngp_code"):
+        sync_fixtures("my_custom_app")
+
+    frappe.db.sql(
+        """
+        update `tabLanded Cost Item` lci
+        set custom_ngp_code = (
+            select item.custom_ngp_code from `tabItem` item where item.name = lci.item_code
+        )
+        where coalesce(lci.custom_ngp_code, '') = ''
+            and lci.item_code in (
+                select name from `tabItem` where coalesce(custom_ngp_code, '') != ''
+            )
+        """
+    )
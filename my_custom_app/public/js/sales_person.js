@@ -63,4 +63,28 @@ frappe.ui.form.on("Visit Target Detail", {
              console.log("Could not find grid row to set read-only status for row:", cdn);
         }
     },
-});
\ No newline at end of file
+});
+frappe.ui.form.on("Sales Person", {
+    onload: function(frm) {
+        // Visit logs publish compact [row name, completed visits] pairs (my_custom_app.visits.realtime);
+        // patch the grid in place instead of reloading the whole document
+        frappe.realtime.off("visit_target_update", frm.__visit_target_update_handler);
+        frm.__visit_target_update_handler = function(data) {
+            if (data.sales_person !== frm.doc.name) {
+                return;
+            }
+            let changed = false;
+            (frm.doc.custom_number_visit_target || []).forEach(function(row) {
+                let update = data.rows.find(r => r[0] === row.name);
+                if (update && row.completed_visits !== update[1]) {
+                    row.completed_visits = update[1];
+                    changed = true;
+                }
+            });
+            if (changed) {
+                frm.refresh_field("custom_number_visit_target");
+            }
+        };
+        frappe.realtime.on("visit_target_update", frm.__visit_target_update_handler);
+    },
+});
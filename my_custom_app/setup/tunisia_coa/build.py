@@ -0,0 +1,73 @@
+# Compile tunisia_coa.csv into tunisia_coa.json, the artifact the installer reads.
+#
+#   python -m my_custom_app.setup.tunisia_coa.build           rebuild the artifact
+#   python -m my_custom_app.setup.tunisia_coa.build --check   fail if it is stale (pre-commit)
+#
+# The CSV is validated here, once, instead of on every install. The artifact holds the accounts in
+# parent-first order with parent indices and lft/rgt already computed, one account per line so a
+# chart change shows up as a readable diff, and a version derived from the CSV contents.
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from my_custom_app.setup.tunisia_coa.parser import (
+    ARTIFACT_COLUMNS,
+    ARTIFACT_FORMAT,
+    ARTIFACT_PATH,
+    CSV_PATH,
+    COAError,
+    build_tree,
+    read_csv,
+)
+
+
+def get_version(csv_path=CSV_PATH):
+    with open(csv_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def compile_artifact(csv_path=CSV_PATH):
+    """Validate the CSV and return (artifact text, warnings). Raises COAError on invalid data."""
+    tree, warnings = build_tree(read_csv(csv_path))
+    header = json.dumps({"format": ARTIFACT_FORMAT, "version": get_version(csv_path), "columns": ARTIFACT_COLUMNS})
+    accounts = ",\n".join(
+        json.dumps([account[column] for column in ARTIFACT_COLUMNS], ensure_ascii=False) for account in tree
+    )
+    # Header keys first, then one account per line
+    return header[:-1] + ', "accounts": [\n' + accounts + "\n]}\n", warnings
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description="Compile tunisia_coa.csv into tunisia_coa.json")
+    args.add_argument("--check", action="store_true", help="exit with 1 if the artifact is out of date")
+    args = args.parse_args(argv)
+
+    try:
+        text, warnings = compile_artifact()
+    except COAError as e:
+        print(f"{CSV_PATH}: {e}", file=sys.stderr)
+        return 1
+    for warning in warnings:
+        print(f"{CSV_PATH}: {warning}", file=sys.stderr)
+
+    current = None
+    if os.path.exists(ARTIFACT_PATH):
+        with open(ARTIFACT_PATH, encoding="utf-8") as f:
+            current = f.read()
+
+    if args.check:
+        if current != text:
+            print(f"{ARTIFACT_PATH} is out of date, run: python -m my_custom_app.setup.tunisia_coa.build")
+            return 1
+        return 0
+
+    if current != text:
+        with open(ARTIFACT_PATH, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# Install the Tunisia chart of accounts for a company.
+#
+# The tree comes precompiled from tunisia_coa.json (see build.py) with lft/rgt already computed;
+# they are appended after the existing Account tree, so a company's ~580 accounts go in with one
+# bulk insert instead of one validated insert (and nested-set shift) per account. A new Tunisian
+# company gets this chart instead of ERPNext's standard one (see provisioning.on_company_insert);
+# companies that already have accounts are never given a second chart.
+import frappe
+from erpnext.accounts.doctype.account.account import get_account_autoname
+from frappe.utils import now
+
+from my_custom_app.setup.tunisia_coa.parser import load_tree
+
+COUNTRY = "Tunisia"
+# Company field -> account number, filled only when empty
+DEFAULT_ACCOUNTS = {
+    "default_receivable_account": "4111",
+    "default_payable_account": "4011",
+    "default_income_account": "707",
+    "default_expense_account": "607",
+    "default_cash_account": "5411",
+    "default_bank_account": "5321",
+    "default_inventory_account": "37",
+    "stock_received_but_not_billed": "4081",
+    "stock_adjustment_account": "603",
+}
+ACCOUNT_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+    "account_name", "account_number", "parent_account", "old_parent", "company",
+    "is_group", "root_type", "report_type", "account_type", "account_currency",
+    "lft", "rgt", "freeze_account", "disabled",
+)
+
+
+def get_coa_tree():
+    """The normalized account tree (see parser.build_tree), in parent-first order."""
+    return load_tree()[1]
+
+
+def has_accounts(company):
+    return bool(frappe.db.exists("Account", {"company": company}))
+
+
+def has_tunisia_coa(company):
+    """Whether `company` has the root accounts of the Tunisia chart."""
+    roots = {account["account_name"] for account in get_coa_tree() if account["parent"] is None}
+    found = frappe.get_all(
+        "Account",
+        filters={"company": company, "parent_account": ["is", "not set"], "account_name": ["in", list(roots)]},
+        pluck="account_name",
+    )
+    return roots <= set(found)
+
+
+def install_tunisia_coa(company):
+    """
+    Create the Tunisia accounts of `company` if it has no accounts yet. Returns the number of
+    accounts created (0 when the company already has a chart, Tunisian or not).
+    """
+    # Lock the tail of the tree first: it also keeps a concurrent install for the same company
+    # from passing the check below before this one commits
+    offset = frappe.db.sql("select coalesce(max(rgt), 0) from `tabAccount` for update")[0][0]
+    if has_accounts(company):
+        return 0
+
+    currency = frappe.get_cached_value("Company", company, "default_currency")
+    tree = get_coa_tree()
+    names = [
+        get_account_autoname(account["account_number"], account["account_name"], company)
+        for account in tree
+    ]
+    timestamp, user = now(), frappe.session.user
+    rows = []
+    for idx, (account, name) in enumerate(zip(tree, names, strict=True), start=1):
+        parent = names[account["parent"]] if account["parent"] is not None else None
+        rows.append(
+            (
+                name, timestamp, timestamp, user, user, 0, idx,
+                account["account_name"], account["account_number"] or None, parent, parent, company,
+                account["is_group"], account["root_type"], account["report_type"], account["account_type"],
+                account["account_currency"] or currency,
+                offset + account["lft"], offset + account["rgt"], "No", 0,
+            )
+        )
+
+    frappe.db.bulk_insert("Account", ACCOUNT_FIELDS, rows)
+    return len(rows)
+
+
+def set_default_accounts(company):
+    """Fill the company's empty default account fields from the Tunisia chart."""
+    accounts = dict(
+        frappe.db.sql(
+            "select account_number, name from `tabAccount` where company = %s and account_number in %s",
+            (company, tuple(DEFAULT_ACCOUNTS.values())),
+        )
+    )
+    current = frappe.db.get_value("Company", company, list(DEFAULT_ACCOUNTS), as_dict=True)
+    missing = {
+        fieldname: accounts[number]
+        for fieldname, number in DEFAULT_ACCOUNTS.items()
+        if not current.get(fieldname) and accounts.get(number)
+    }
+    if missing:
+        frappe.db.set_value("Company", company, missing)
+    return missing
@@ -0,0 +1,234 @@
+# Parse tunisia_coa.csv into an account tree with precomputed nested-set bounds.
+#
+# Pure Python (no frappe), so it can be used at build time and in benchmarks. build.py compiles
+# the tree into tunisia_coa.json; the installer only reads that artifact through load_tree().
+# The CSV is hand-maintained and has quirks this module normalizes:
+#   - quoted names containing commas, and rows listed after their children
+#   - parents referenced by number or, for the "4 - Classe 4" tiers accounts, by name only
+#   - the same name (and for 4586/4587 the same number) under ACTIF and PASSIF parents
+#   - a root type outside Asset/Liability/Equity/Income/Expense, and children under a ledger
+import csv
+import json
+import os
+from functools import lru_cache
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), "tunisia_coa.csv")
+ARTIFACT_PATH = os.path.join(os.path.dirname(__file__), "tunisia_coa.json")
+ARTIFACT_FORMAT = 1
+ARTIFACT_COLUMNS = (
+    "account_name", "account_number", "parent", "is_group",
+    "account_type", "root_type", "account_currency", "lft", "rgt",
+)
+
+ROOT_TYPES = ("Asset", "Liability", "Equity", "Income", "Expense")
+REPORT_TYPES = {
+    "Asset": "Balance Sheet",
+    "Liability": "Balance Sheet",
+    "Equity": "Balance Sheet",
+    "Income": "Profit and Loss",
+    "Expense": "Profit and Loss",
+}
+SIDE_SUFFIX = {"Asset": "ACTIF", "Liability": "PASSIF"}
+
+
+class COAError(ValueError):
+    pass
+
+
+def read_csv(path=CSV_PATH):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+@lru_cache(maxsize=1)
+def load_tree(path=ARTIFACT_PATH):
+    """
+    The compiled tree as a tuple of account dicts (same keys as build_tree, without `line`),
+    read once per process. Returns (version, accounts).
+    """
+    with open(path, encoding="utf-8") as f:
+        artifact = json.load(f)
+    if artifact["format"] != ARTIFACT_FORMAT:
+        raise COAError(f"{path}: unsupported format {artifact['format']}, rebuild it")
+
+    columns = artifact["columns"]
+    accounts = []
+    for values in artifact["accounts"]:
+        account = dict(zip(columns, values, strict=True))
+        account["report_type"] = REPORT_TYPES[account["root_type"]]
+        accounts.append(account)
+    return artifact["version"], tuple(accounts)
+
+
+def build_tree(rows):
+    """
+    Turn CSV rows into a list of account dicts in tree pre-order (parents before children):
+    account_name, account_number, parent (index into the list or None), is_group, account_type,
+    root_type, report_type, account_currency, lft, rgt (nested-set bounds starting at 1).
+    Also returns the list of warnings for the quirks that were normalized.
+    """
+    warnings = []
+    accounts = []
+    for line, row in enumerate(rows, start=2):
+        name = (row.get("Account Name") or "").strip()
+        if not name:
+            raise COAError(f"Line {line}: Account Name is empty")
+
+        is_group = (row.get("Is Group") or "").strip()
+        if is_group not in ("0", "1"):
+            warnings.append(f"Line {line}: Is Group {is_group!r} read as 0")
+            is_group = "0"
+
+        accounts.append(
+            {
+                "line": line,
+                "account_name": name,
+                "account_number": (row.get("Account Number") or "").strip(),
+                "parent_name": (row.get("Parent Account") or "").strip(),
+                "parent_number": (row.get("Parent Account Number") or "").strip(),
+                "is_group": int(is_group),
+                "account_type": (row.get("Account Type") or "").strip(),
+                "root_type": (row.get("Root Type") or "").strip(),
+                "account_currency": (row.get("Account Currency") or "").strip(),
+            }
+        )
+
+    _link_parents(accounts, warnings)
+    _fix_root_types(accounts, warnings)
+    _make_unique(accounts, warnings)
+    ordered = _preorder(accounts)
+    _assign_nested_set(ordered)
+
+    for account in ordered:
+        if account["parent"] is None and account["is_group"] == 0:
+            raise COAError(f"Line {account['line']}: root account {account['account_name']} must be a group")
+        for key in ("parent_name", "parent_number", "children"):
+            account.pop(key, None)
+    return ordered, warnings
+
+
+def _link_parents(accounts, warnings):
+    by_number = {}
+    by_name = {}
+    for i, account in enumerate(accounts):
+        if account["account_number"]:
+            by_number.setdefault(account["account_number"], []).append(i)
+        by_name.setdefault(account["account_name"], []).append(i)
+
+    for account in accounts:
+        account["children"] = []
+
+    for i, account in enumerate(accounts):
+        if not account["parent_name"] and not account["parent_number"]:
+            account["parent"] = None
+            continue
+
+        # Prefer the number; fall back to the name (the "4 - Classe 4" accounts have none)
+        candidates = by_number.get(account["parent_number"]) if account["parent_number"] else None
+        if not candidates:
+            candidates = by_name.get(account["parent_name"])
+        if candidates and len(candidates) > 1 and account["parent_name"]:
+            candidates = [c for c in candidates if accounts[c]["account_name"] == account["parent_name"]]
+        if not candidates:
+            raise COAError(
+                f"Line {account['line']}: parent {account['parent_number'] or account['parent_name']!r} not found"
+            )
+        if len(candidates) > 1:
+            raise COAError(f"Line {account['line']}: parent {account['parent_name']!r} is ambiguous")
+
+        parent = candidates[0]
+        account["parent"] = parent
+        accounts[parent]["children"].append(i)
+        if not accounts[parent]["is_group"]:
+            warnings.append(f"Line {accounts[parent]['line']}: {accounts[parent]['account_name']} has children, made a group")
+            accounts[parent]["is_group"] = 1
+
+    # Reject cycles before walking the tree
+    for i in range(len(accounts)):
+        seen = set()
+        node = i
+        while node is not None:
+            if node in seen:
+                raise COAError(f"Line {accounts[i]['line']}: parent chain loops")
+            seen.add(node)
+            node = accounts[node]["parent"]
+
+
+def _fix_root_types(accounts, warnings):
+    for account in accounts:
+        if account["root_type"] in ROOT_TYPES:
+            continue
+        node = account["parent"]
+        while node is not None and accounts[node]["root_type"] not in ROOT_TYPES:
+            node = accounts[node]["parent"]
+        if node is None:
+            raise COAError(f"Line {account['line']}: invalid Root Type {account['root_type']!r}")
+        warnings.append(
+            f"Line {account['line']}: Root Type {account['root_type']!r} replaced by {accounts[node]['root_type']}"
+        )
+        account["root_type"] = accounts[node]["root_type"]
+
+    for account in accounts:
+        account["report_type"] = REPORT_TYPES[account["root_type"]]
+
+
+def _make_unique(accounts, warnings):
+    # ERPNext names accounts "<number> - <name> - <abbr>" and account numbers must be unique per
+    # company: the ACTIF / PASSIF twins get their side appended and the second twin loses its number
+    numbers = set()
+    names = set()
+    for account in accounts:
+        if account["account_number"] in numbers:
+            warnings.append(f"Line {account['line']}: duplicate Account Number {account['account_number']} moved into the name")
+            account["account_name"] = f"{account['account_number']} - {account['account_name']}"
+            account["account_number"] = ""
+        if account["account_number"]:
+            numbers.add(account["account_number"])
+
+        key = account_key(account)
+        if key in names:
+            suffix = SIDE_SUFFIX.get(account["root_type"], str(account["line"]))
+            account["account_name"] = f"{account['account_name']} ({suffix})"
+            key = account_key(account)
+            if key in names:
+                raise COAError(f"Line {account['line']}: duplicate account {key}")
+        names.add(key)
+
+
+def account_key(account):
+    """The account's name without the company abbreviation, as ERPNext builds it."""
+    if account["account_number"]:
+        return f"{account['account_number']} - {account['account_name']}"
+    return account["account_name"]
+
+
+def _preorder(accounts):
+    ordered = []
+    new_index = {}
+    stack = [i for i in reversed(range(len(accounts))) if accounts[i]["parent"] is None]
+    while stack:
+        i = stack.pop()
+        new_index[i] = len(ordered)
+        ordered.append(accounts[i])
+        stack.extend(reversed(accounts[i]["children"]))
+
+    for account in ordered:
+        if account["parent"] is not None:
+            account["parent"] = new_index[account["parent"]]
+    return ordered
+
+
+def _assign_nested_set(ordered):
+    # Pre-order gives lft directly; rgt closes each subtree once its last descendant is numbered
+    counter = 0
+    open_nodes = []
+    for i, account in enumerate(ordered):
+        while open_nodes and open_nodes[-1] != account["parent"]:
+            counter += 1
+            ordered[open_nodes.pop()]["rgt"] = counter
+        counter += 1
+        account["lft"] = counter
+        open_nodes.append(i)
+    while open_nodes:
+        counter += 1
+        ordered[open_nodes.pop()]["rgt"] = counter
@@ -0,0 +1,282 @@
+# Background provisioning of Tunisian companies: chart of accounts, VAT templates, payment and
+# warehouse accounts.
+#
+# Only companies without any accounts (they get the Tunisia chart) or already on the Tunisia chart
+# are provisioned; a company on another chart is left alone. Companies are split into chunks, each
+# chunk is one job on the long queue, so a site with many companies is provisioned by several
+# workers in parallel. Inside a job every company is its own transaction and every step skips what
+# already exists, so a failed company is simply provisioned again by the next run. A new Tunisian
+# company is saved without any chart and provisioned the same way, in the background. Progress is
+# published over realtime as `tunisia_coa_progress`.
+import frappe
+from frappe import _
+from frappe.utils import now
+
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.setup.tunisia_coa.installer import (
+    COUNTRY,
+    DEFAULT_ACCOUNTS,
+    has_accounts,
+    has_tunisia_coa,
+    install_tunisia_coa,
+    set_default_accounts,
+)
+from my_custom_app.utils import get_counters
+
+EVENT = "tunisia_coa_progress"
+PROGRESS_KEY = "my_custom_app:coa_provisioning:"
+PROGRESS_TTL = 24 * 60 * 60
+COMPANIES_PER_JOB = 5
+
+VAT_RATES = (19, 13, 7, 0)
+SALES_VAT_ACCOUNT = "4367"  # Taxes sur le chiffre d'affaires collectées
+PURCHASE_VAT_ACCOUNT = "4366"  # Taxes sur le chiffre d'affaires déductibles
+# Mode of Payment type -> account number
+PAYMENT_ACCOUNTS = {"Cash": "5411", "Bank": "5321"}
+ACCOUNT_NUMBERS = (
+    SALES_VAT_ACCOUNT, PURCHASE_VAT_ACCOUNT, *PAYMENT_ACCOUNTS.values(), *DEFAULT_ACCOUNTS.values()
+)
+
+TEMPLATE_FIELDS = ("name", "creation", "modified", "owner", "modified_by", "docstatus", "title", "company")
+SALES_TAX_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "parent", "parentfield", "parenttype", "idx",
+    "charge_type", "account_head", "description", "rate", "cost_center",
+)
+PURCHASE_TAX_FIELDS = (*SALES_TAX_FIELDS, "category", "add_deduct_tax")
+PAYMENT_ACCOUNT_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "parent", "parentfield", "parenttype", "idx", "company", "default_account",
+)
+
+
+@frappe.whitelist()
+def provision_companies(companies=None):
+    """
+    Queue provisioning of `companies` (default: every company in Tunisia). Companies on a chart
+    other than the Tunisia one are skipped. Returns the run id whose progress is published as
+    `tunisia_coa_progress` and readable with get_progress.
+    """
+    frappe.only_for("System Manager")
+    companies = frappe.parse_json(companies) if companies else None
+    return enqueue_provisioning(companies)
+
+
+def enqueue_provisioning(companies=None):
+    if companies is None:
+        companies = frappe.get_all("Company", filters={"country": COUNTRY}, pluck="name")
+    if not companies:
+        return None
+
+    run = frappe.generate_hash(length=10)
+    key = frappe.cache().make_key(PROGRESS_KEY + run)
+    pipe = frappe.cache().pipeline()
+    pipe.hset(key, mapping={"total": len(companies), "done": 0, "failed": 0, "skipped": 0})
+    pipe.expire(key, PROGRESS_TTL)
+    pipe.execute()
+
+    for start in range(0, len(companies), COMPANIES_PER_JOB):
+        frappe.enqueue(
+            "my_custom_app.setup.tunisia_coa.provisioning.run_provisioning_job",
+            queue="long",
+            enqueue_after_commit=True,
+            job_id=f"my_custom_app:coa_provisioning:{run}:{start}",
+            run=run,
+            companies=companies[start : start + COMPANIES_PER_JOB],
+            user=frappe.session.user,
+        )
+    return run
+
+
+@frappe.whitelist()
+def get_progress(run):
+    frappe.only_for("System Manager")
+    return get_counters(PROGRESS_KEY + run)
+
+
+def run_provisioning_job(run, companies, user=None):
+    for company in companies:
+        try:
+            status = "done" if provision_company(company) else "skipped"
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=_("Tunisia provisioning failed for {0}").format(company))
+            status = "failed"
+        _report(run, company, status, user)
+
+
+def provision_company(company):
+    """
+    Create everything missing for `company`; safe to call any number of times. Returns False
+    (and changes nothing) when the company already uses another chart of accounts.
+    """
+    if has_accounts(company) and not has_tunisia_coa(company):
+        return False
+    install_tunisia_coa(company)
+    accounts = _get_accounts(company)
+    create_vat_templates(company, accounts)
+    set_payment_accounts(company, accounts)
+    set_warehouse_accounts(company, accounts)
+    return True
+
+
+def _report(run, company, status, user):
+    cache = frappe.cache()
+    key = cache.make_key(PROGRESS_KEY + run)
+    pipe = cache.pipeline()
+    pipe.hincrby(key, status, 1)
+    pipe.hmget(key, "total", "done", "failed", "skipped")
+    total, done, failed, skipped = (int(value or 0) for value in pipe.execute()[1])
+    frappe.publish_realtime(
+        EVENT,
+        {
+            "run": run, "company": company, "status": status,
+            "total": total, "done": done, "failed": failed, "skipped": skipped,
+        },
+        user=user,
+    )
+
+
+def _get_accounts(company):
+    """{account number: account name} for the accounts provisioning links to."""
+    return dict(
+        frappe.db.sql(
+            "select account_number, name from `tabAccount` where company = %s and account_number in %s",
+            (company, ACCOUNT_NUMBERS),
+        )
+    )
+
+
+def create_vat_templates(company, accounts):
+    """Sales and purchase templates for every VAT rate, inserted in one pass per doctype."""
+    abbr, cost_center = frappe.get_cached_value("Company", company, ["abbr", "cost_center"])
+    timestamp, user = now(), frappe.session.user
+
+    for template_doctype, tax_doctype, account_number in (
+        ("Sales Taxes and Charges Template", "Sales Taxes and Charges", SALES_VAT_ACCOUNT),
+        ("Purchase Taxes and Charges Template", "Purchase Taxes and Charges", PURCHASE_VAT_ACCOUNT),
+    ):
+        account = accounts.get(account_number)
+        if not account:
+            continue
+
+        # Template names follow ERPNext's autoname: "<title> - <company abbr>"
+        titles = {f"TVA {rate}%": rate for rate in VAT_RATES}
+        names = {f"{title} - {abbr}": title for title in titles}
+        existing = set(frappe.get_all(template_doctype, filters={"name": ["in", list(names)]}, pluck="name"))
+
+        templates, taxes = [], []
+        for name, title in names.items():
+            if name in existing:
+                continue
+            templates.append((name, timestamp, timestamp, user, user, 0, title, company))
+            tax = (
+                frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+                name, "taxes", template_doctype, 1,
+                "On Net Total", account, title, titles[title], cost_center,
+            )
+            if tax_doctype == "Purchase Taxes and Charges":
+                tax += ("Total", "Add")
+            taxes.append(tax)
+
+        if templates:
+            frappe.db.bulk_insert(template_doctype, TEMPLATE_FIELDS, templates)
+            frappe.db.bulk_insert(
+                tax_doctype,
+                PURCHASE_TAX_FIELDS if tax_doctype == "Purchase Taxes and Charges" else SALES_TAX_FIELDS,
+                taxes,
+            )
+
+
+def set_payment_accounts(company, accounts):
+    """Link every Cash and Bank Mode of Payment without an account for `company`."""
+    modes = frappe.get_all(
+        "Mode of Payment", filters={"type": ["in", list(PAYMENT_ACCOUNTS)], "enabled": 1}, fields=["name", "type"]
+    )
+    if not modes:
+        return
+
+    linked = set(
+        frappe.get_all("Mode of Payment Account", filters={"company": company}, pluck="parent")
+    )
+    next_idx = dict(
+        frappe.db.sql(
+            """
+            select parent, max(idx) + 1 from `tabMode of Payment Account`
+            where parenttype = 'Mode of Payment' and parent in %s
+            group by parent
+            """,
+            (tuple(mode.name for mode in modes),),
+        )
+    )
+
+    timestamp, user = now(), frappe.session.user
+    rows = [
+        (
+            frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+            mode.name, "accounts", "Mode of Payment", next_idx.get(mode.name) or 1,
+            company, accounts[PAYMENT_ACCOUNTS[mode.type]],
+        )
+        for mode in modes
+        if mode.name not in linked and accounts.get(PAYMENT_ACCOUNTS[mode.type])
+    ]
+    if rows:
+        frappe.db.bulk_insert("Mode of Payment Account", PAYMENT_ACCOUNT_FIELDS, rows)
+
+
+def set_warehouse_accounts(company, accounts):
+    """
+    Create the default warehouses and fill the company's default accounts (everything ERPNext
+    sets up with its own chart), then link warehouses that have no account.
+    """
+    doc = frappe.get_doc("Company", company)
+    if not frappe.db.exists("Warehouse", {"company": company}):
+        doc.create_default_warehouses()
+
+    set_default_accounts(company)
+    # ERPNext's own defaults (round off, depreciation, ...) by account type, for the fields still empty
+    doc.reload()
+    doc.set_default_accounts()
+    inventory_account = frappe.db.get_value("Company", company, "default_inventory_account")
+    if inventory_account:
+        frappe.db.sql(
+            """
+            update `tabWarehouse` set account = %s
+            where company = %s and is_group = 0 and coalesce(account, '') = ''
+            """,
+            (inventory_account, company),
+        )
+
+
+def after_install():
+    # Existing companies already have a chart (ERPNext's or their own): only those without any
+    # accounts get the Tunisia one. Others can opt in through provision_companies.
+    companies = [
+        company
+        for company in frappe.get_all("Company", filters={"country": COUNTRY}, pluck="name")
+        if not has_accounts(company)
+    ]
+    enqueue_provisioning(companies)
+
+
+@instrumented
+def on_company_insert(doc, method=None):
+    # after_insert runs before ERPNext's Company.on_update: ask it to skip its standard chart (and
+    # the warehouses and default accounts that go with it), which the provisioning job replaces
+    if doc.country != COUNTRY or frappe.local.flags.ignore_chart_of_accounts:
+        return
+    frappe.local.flags.ignore_chart_of_accounts = True
+    doc.flags.install_tunisia_coa = True
+
+
+@instrumented
+def on_company_update(doc, method=None):
+    if not doc.flags.install_tunisia_coa:
+        return
+    doc.flags.install_tunisia_coa = False
+    frappe.local.flags.ignore_chart_of_accounts = False
+
+    # The chart, warehouses, default accounts, VAT templates and payment accounts are all set up
+    # by the provisioning job once the company is committed, so the save itself stays fast
+    enqueue_provisioning([doc.name])
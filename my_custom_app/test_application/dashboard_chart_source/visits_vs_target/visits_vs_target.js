@@ -0,0 +1,16 @@
+// Copyright (c) 2026, DON and contributors
+// For license information, please see license.txt
+
+frappe.provide("frappe.dashboards.chart_sources");
+
+frappe.dashboards.chart_sources["Visits vs Target"] = {
+	method: "my_custom_app.test_application.dashboard_chart_source.visits_vs_target.visits_vs_target.get",
+	filters: [
+		{
+			fieldname: "sales_person",
+			label: __("Sales Person"),
+			fieldtype: "Link",
+			options: "Sales Person",
+		},
+	],
+};
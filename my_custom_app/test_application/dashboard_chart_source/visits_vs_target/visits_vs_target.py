@@ -0,0 +1,106 @@
+# Copyright (c) 2026, DON and contributors
+# For license information, please see license.txt
+
+from bisect import bisect_left
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, formatdate, getdate, nowdate
+from frappe.utils.dashboard import cache_source
+from frappe.utils.dateutils import get_dates_from_timegrain, get_from_date_from_timespan
+
+
+@frappe.whitelist()
+@cache_source
+def get(
+	chart_name=None,
+	chart=None,
+	no_cache=None,
+	filters=None,
+	from_date=None,
+	to_date=None,
+	timespan=None,
+	time_interval=None,
+	heatmap_year=None,
+):
+	"""
+	Visits per period read from the Sales Visit Daily Rollup, next to the visit goals of the
+	targets active in the period (a target's goal is spread evenly over the days it covers).
+	Both are read through frappe.get_list, so user permissions and permission query conditions
+	restrict them like any other report.
+	"""
+	frappe.has_permission("Sales Visit Daily Rollup", "read", throw=True)
+
+	if chart_name:
+		chart = frappe.get_doc("Dashboard Chart", chart_name)
+	else:
+		chart = frappe._dict(frappe.parse_json(chart))
+
+	timespan = chart.timespan
+	if chart.timespan == "Select Date Range":
+		from_date = chart.from_date
+		to_date = chart.to_date
+	timegrain = chart.time_interval or "Monthly"
+	filters = frappe._dict(frappe.parse_json(filters) or frappe.parse_json(chart.filters_json) or {})
+
+	to_date = getdate(to_date or nowdate())
+	from_date = getdate(from_date or get_from_date_from_timespan(to_date, timespan))
+	period_ends = [getdate(date) for date in get_dates_from_timegrain(from_date, to_date, timegrain)]
+	if not period_ends:
+		return {"labels": [], "datasets": []}
+
+	visits = [0] * len(period_ends)
+	for visit_date, count in _get_daily_visits(from_date, period_ends[-1], filters.sales_person):
+		visits[bisect_left(period_ends, getdate(visit_date))] += int(count)
+
+	goals = [0.0] * len(period_ends)
+	period_starts = [from_date] + [add_days(end, 1) for end in period_ends[:-1]]
+	for start_date, end_date, goal in _get_target_goals(from_date, period_ends[-1], filters.sales_person):
+		start_date, end_date = getdate(start_date), getdate(end_date)
+		per_day = float(goal or 0) / max((end_date - start_date).days + 1, 1)
+		for i, (period_start, period_end) in enumerate(zip(period_starts, period_ends, strict=True)):
+			overlap = (min(end_date, period_end) - max(start_date, period_start)).days + 1
+			if overlap > 0:
+				goals[i] += per_day * overlap
+
+	return {
+		"labels": [formatdate(date) for date in period_ends],
+		"datasets": [
+			{"name": _("Visits"), "values": visits},
+			{"name": _("Target"), "values": [round(goal, 1) for goal in goals]},
+		],
+	}
+
+
+def _get_daily_visits(from_date, to_date, sales_person=None):
+	filters = {"visit_date": ["between", [from_date, to_date]]}
+	if sales_person:
+		filters["sales_person"] = sales_person
+	return frappe.get_list(
+		"Sales Visit Daily Rollup",
+		filters=filters,
+		fields=["visit_date", "sum(visit_count) as visits"],
+		group_by="visit_date",
+		order_by="visit_date",
+		as_list=True,
+	)
+
+
+def _get_target_goals(from_date, to_date, sales_person=None):
+	# Targets share a handful of periods (months, quarters), so this returns few rows
+	filters = {
+		"parentfield": "custom_number_visit_target",
+		"start_date": ["<=", to_date],
+		"end_date": [">=", from_date],
+	}
+	if sales_person:
+		filters["parent"] = sales_person
+	return frappe.get_list(
+		"Visit Target Detail",
+		parent_doctype="Sales Person",
+		filters=filters,
+		fields=["start_date", "end_date", "sum(goal_number_of_visits) as goal"],
+		group_by="start_date, end_date",
+		order_by="start_date",
+		as_list=True,
+	)
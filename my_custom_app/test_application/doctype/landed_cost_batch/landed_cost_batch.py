@@ -0,0 +1,10 @@
+# Copyright (c) 2026, DON and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class LandedCostBatch(Document):
+	# In-flight state of a batch run by my_custom_app.landed_cost.batch, deleted once it finishes
+	pass
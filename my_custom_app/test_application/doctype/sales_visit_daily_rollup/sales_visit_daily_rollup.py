@@ -0,0 +1,16 @@
+# Copyright (c) 2026, DON and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class SalesVisitDailyRollup(Document):
+	# Rows are written by my_custom_app.visits.rollup only
+	pass
+
+
+def on_doctype_update():
+	# Dashboard reads by date range, optionally for one sales person
+	frappe.db.add_index("Sales Visit Daily Rollup", ["visit_date", "sales_person"])
+	frappe.db.add_index("Sales Visit Daily Rollup", ["sales_person", "visit_date"])
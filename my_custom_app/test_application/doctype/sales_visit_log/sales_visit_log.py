@@ -1,92 +1,89 @@
 # In my_custom_app/my_custom_app/doctype/sales_visit_log/sales_visit_log.py
 import frappe
 from frappe.model.document import Document
-from frappe.utils import getdate
+from frappe.utils import getdate, now
+
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.visits.progress import invalidate_progress_cache
+from my_custom_app.visits.realtime import queue_target_refresh
+from my_custom_app.visits.rollup import add_visit
+from my_custom_app.visits.targets import find_visit_target_rows
 
 class SalesVisitLog(Document):
     # This method will be called by the on_submit hook
+    @instrumented
     def on_submit(self):
+        add_visit(self, 1)
         self.update_visit_target_count()
-        
+
     # This method will be called by the on_cancel hook
+    @instrumented
     def on_cancel(self):
+        add_visit(self, -1)
         self.update_visit_target_count(decrement=True)
 
     def update_visit_target_count(self, decrement=False):
         # Get necessary data from the submitted visit log
-        action = "Decrementing" if decrement else "Updating"
-        
         sales_person_name = self.get("sales_person")
         visit_date_str = self.get("visit_date")
         customer_name = self.get("customer")
-        
+
         if not sales_person_name or not visit_date_str or not customer_name:
             frappe.throw("Sales Person, Visit Date, and Customer are required.")
             return
 
         visit_date = getdate(visit_date_str)
 
-        try:
-            # Load the parent Sales Person document
-            sales_person_doc = frappe.get_doc("Sales Person", sales_person_name)
-            child_table_fieldname = "custom_number_visit_target" # Your child table fieldname
-            visit_targets = sales_person_doc.get(child_table_fieldname)
-            target_row_found = False
-
-            if not visit_targets:
-                return # No targets to update
-
-            # Iterate through the visit target rows
-            for target_row in visit_targets:
-                target_customer = target_row.get("customer")
-                start_date_str = target_row.get("start_date")
-                end_date_str = target_row.get("end_date")
-
-                # Check if this row matches the customer and date range
-                if (target_customer == customer_name and 
-                    start_date_str and end_date_str):
-                    
-                    start_date = getdate(start_date_str)
-                    end_date = getdate(end_date_str)
-                    if start_date <= visit_date <= end_date:
-                        # Found the matching target row, update the count
-                        current_count = target_row.get("completed_visits") or 0
-                        if decrement:
-                            # Ensure we don't go below zero
-                            target_row.completed_visits = max(0, current_count - 1)
-                            action_text = "Decremented"
-                        else:
-                            target_row.completed_visits = current_count + 1
-                            action_text = "Incremented"
-                            
-                        target_row_found = True
-                        break # Stop checking rows once a match is found and updated
-            
-            if target_row_found:
-                # Save the parent Sales Person document to persist changes in the child table
-                # Use flags to avoid triggering recursive saves if there are other hooks
-                sales_person_doc.flags.ignore_validate = True # Skip our overlap validation on this save
-                sales_person_doc.save(ignore_permissions=True) # Use ignore_permissions if needed
-                frappe.db.commit() # Ensure change is committed
-                
-                # Notify user and publish realtime update to refresh any open Sales Person forms
-                frappe.publish_realtime(
-                    event="refresh_form",
-                    doctype="Sales Person",
-                    docname=sales_person_name,
-                    after_commit=True
-                )
-                
-                # Show a success message to the user
-                action_msg = "decremented" if decrement else "updated"
-                frappe.msgprint(f"Visit count {action_msg} for {sales_person_name} and {customer_name}")
-                
-            else:
-                frappe.logger().error(
-                    f"No matching Visit Target found for Sales Visit Log {self.name} (SP: {sales_person_name}, Customer: {customer_name}, Date: {visit_date_str})",
-                    "Visit Target Update Failed"
-                )
-
-        except Exception as e:
-            frappe.logger().error(frappe.get_traceback(), f"Error updating visit target for {self.name}")
+        # Find the matching customer and territory target rows with indexed queries instead of
+        # loading the Sales Person; bulk sync resolves the whole chunk up front and passes them in
+        target_rows = self.flags.visit_target_rows
+        if target_rows is None:
+            target_rows = find_visit_target_rows(sales_person_name, customer_name, visit_date)
+
+        if not target_rows:
+            frappe.logger().error(
+                f"No matching Visit Target found for Sales Visit Log {self.name} (SP: {sales_person_name}, Customer: {customer_name}, Date: {visit_date_str})"
+            )
+            return
+
+        delta = -1 if decrement else 1
+
+        # Bulk sync collects deltas and applies them once per chunk (see my_custom_app.visits.sync)
+        if self.flags.visit_target_deltas is not None:
+            for target_row in target_rows:
+                key = (sales_person_name, target_row)
+                self.flags.visit_target_deltas[key] = self.flags.visit_target_deltas.get(key, 0) + delta
+            return
+
+        # Atomic in-database increment/decrement: concurrent submits cannot lose updates, and
+        # the change commits (or rolls back) with the rest of the submit transaction
+        for target_row in target_rows:
+            apply_visit_count_delta(target_row, delta)
+
+        # Patch any open Sales Person form once the submit commits; updates for the same sales
+        # person are merged into one compact event (see my_custom_app.visits.realtime)
+        queue_target_refresh(sales_person_name, target_rows)
+
+        # Show a success message to the user, once per sales person per request (bulk submit)
+        notified = frappe.local.flags.setdefault("visit_count_notified", set())
+        if sales_person_name not in notified:
+            notified.add(sales_person_name)
+            action_msg = "decremented" if decrement else "updated"
+            frappe.msgprint(f"Visit count {action_msg} for {sales_person_name}", alert=True)
+
+def apply_visit_count_delta(target_row, delta):
+    """Add `delta` to completed_visits of a Visit Target Detail row in place, never going below zero."""
+    frappe.db.sql(
+        """
+        update `tabVisit Target Detail`
+        set completed_visits = greatest(coalesce(completed_visits, 0) + %(delta)s, 0),
+            modified = %(modified)s
+        where name = %(name)s
+        """,
+        {"delta": delta, "modified": now(), "name": target_row},
+    )
+    invalidate_progress_cache()
+
 
+def on_doctype_update():
+    frappe.db.add_index("Sales Visit Log", ["sales_person", "customer", "visit_date"])
@@ -0,0 +1,111 @@
+# Copyright (c) 2026, DON and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from my_custom_app.visits.sync import ingest_visits
+
+TEST_TERRITORY = "_Test Visit Territory"
+TEST_CUSTOMER = "_Test Visit Customer"
+TEST_SALES_PERSON = "_Test Visit Sales Person"
+VISIT_DATE = "2026-03-10"
+
+
+def make_visit_fixtures():
+    """A customer and a sales person with one customer target covering 2026."""
+    if not frappe.db.exists("Territory", TEST_TERRITORY):
+        frappe.get_doc(
+            {"doctype": "Territory", "territory_name": TEST_TERRITORY, "parent_territory": "All Territories"}
+        ).insert()
+    if not frappe.db.exists("Customer", TEST_CUSTOMER):
+        frappe.get_doc(
+            {
+                "doctype": "Customer",
+                "customer_name": TEST_CUSTOMER,
+                "customer_group": frappe.db.get_value("Customer Group", {"is_group": 0}) or "All Customer Groups",
+                "territory": TEST_TERRITORY,
+            }
+        ).insert()
+    if not frappe.db.exists("Sales Person", TEST_SALES_PERSON):
+        sales_person = frappe.get_doc(
+            {"doctype": "Sales Person", "sales_person_name": TEST_SALES_PERSON, "parent_sales_person": "Sales Team"}
+        )
+        sales_person.append(
+            "custom_number_visit_target",
+            {
+                "customer": TEST_CUSTOMER,
+                "period_type": "Custom Range",
+                "start_date": "2026-01-01",
+                "end_date": "2026-12-31",
+                "goal_number_of_visits": 10,
+            },
+        )
+        sales_person.insert()
+
+
+def get_target_row():
+    return frappe.db.get_value(
+        "Visit Target Detail",
+        {"parent": TEST_SALES_PERSON, "customer": TEST_CUSTOMER},
+        ["name", "completed_visits"],
+        as_dict=True,
+    )
+
+
+def make_visit(key=None, **values):
+    return {
+        "idempotency_key": key or frappe.generate_hash(length=12),
+        "sales_person": TEST_SALES_PERSON,
+        "customer": TEST_CUSTOMER,
+        "visit_date": VISIT_DATE,
+        **values,
+    }
+
+
+class TestSalesVisitLogSync(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        make_visit_fixtures()
+
+    def test_key_repeated_in_batch_creates_one_visit(self):
+        visit = make_visit()
+        results = ingest_visits([visit, dict(visit)])
+
+        self.assertEqual([result["status"] for result in results], ["submitted", "duplicate"])
+        self.assertEqual(results[1]["name"], results[0]["name"])
+        self.assertEqual(frappe.db.count("Sales Visit Log", {"idempotency_key": visit["idempotency_key"]}), 1)
+
+    def test_failed_occurrence_is_retried_by_a_later_one(self):
+        key = frappe.generate_hash(length=12)
+        results = ingest_visits(
+            [make_visit(key, customer="_Test Visit Missing Customer"), make_visit(key), make_visit(key)]
+        )
+
+        self.assertEqual([result["status"] for result in results], ["error", "submitted", "duplicate"])
+        self.assertEqual(results[2]["name"], results[1]["name"])
+        self.assertEqual(frappe.db.get_value("Sales Visit Log", {"idempotency_key": key}, "docstatus"), 1)
+
+    def test_existing_draft_is_submitted(self):
+        visit = make_visit()
+        draft = frappe.get_doc({"doctype": "Sales Visit Log", **visit}).insert()
+        completed = get_target_row().completed_visits or 0
+
+        results = ingest_visits([visit], submit=1)
+
+        self.assertEqual(results[0]["status"], "submitted")
+        self.assertEqual(results[0]["name"], draft.name)
+        self.assertEqual(frappe.db.get_value("Sales Visit Log", draft.name, "docstatus"), 1)
+        self.assertEqual(get_target_row().completed_visits, completed + 1)
+
+    def test_existing_submitted_key_is_a_duplicate(self):
+        visit = make_visit()
+        first = ingest_visits([visit])[0]
+        completed = get_target_row().completed_visits
+
+        results = ingest_visits([visit])
+
+        self.assertEqual(results[0]["status"], "duplicate")
+        self.assertEqual(results[0]["name"], first["name"])
+        self.assertEqual(get_target_row().completed_visits, completed)
@@ -4,3 +4,8 @@ from frappe.model.document import Document
 
 class VisitTargetDetail(Document):
     pass # No custom logic needed here for this validation
+
+
+def on_doctype_update():
+    # Target lookup by sales person, customer and date (my_custom_app.visits.targets)
+    frappe.db.add_index("Visit Target Detail", ["parent", "customer", "start_date", "end_date"])
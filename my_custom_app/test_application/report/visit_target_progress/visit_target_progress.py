@@ -0,0 +1,54 @@
+# Copyright (c) 2026, DON and contributors
+# For license information, please see license.txt
+
+from frappe import _
+from frappe.utils import cint
+
+from my_custom_app.visits.progress import (
+	GROUP_BY_COLUMNS,
+	MAX_PAGE_LENGTH,
+	SELECT_COLUMNS,
+	get_visit_target_progress,
+)
+
+
+def execute(filters=None):
+	filters = dict(filters or {})
+	group_by = filters.pop("group_by", None)
+	page = max(cint(filters.pop("page", None)), 1)
+	page_length = min(cint(filters.pop("page_length", None)) or MAX_PAGE_LENGTH, MAX_PAGE_LENGTH)
+	start = (page - 1) * page_length
+
+	result = get_visit_target_progress(filters, group_by=group_by, start=start, page_length=page_length)
+	return get_columns(group_by), result["data"], get_message(result, start, page)
+
+
+def get_message(result, start, page):
+	total, shown = result["total"], len(result["data"])
+	if not total or (start == 0 and shown == total):
+		return None
+	if not shown:
+		return _("Page {0} is empty: there are {1} rows.").format(page, total)
+	return _("Showing rows {0} to {1} of {2}. Change the Page filter to see the others.").format(
+		start + 1, start + shown, total
+	)
+
+
+def get_columns(group_by=None):
+	columns = [
+		{"fieldname": "sales_person", "label": _("Sales Person"), "fieldtype": "Link", "options": "Sales Person", "width": 180},
+		{"fieldname": "customer", "label": _("Customer"), "fieldtype": "Link", "options": "Customer", "width": 180},
+		{"fieldname": "territory", "label": _("Territory"), "fieldtype": "Link", "options": "Territory", "width": 150},
+		{"fieldname": "start_date", "label": _("Start Date"), "fieldtype": "Date", "width": 110},
+		{"fieldname": "end_date", "label": _("End Date"), "fieldtype": "Date", "width": 110},
+	]
+	if group_by:
+		grouped = {SELECT_COLUMNS[column] for column in GROUP_BY_COLUMNS[group_by]}
+		columns = [c for c in columns if c["fieldname"] in grouped]
+
+	return [
+		*columns,
+		{"fieldname": "goal", "label": _("Goal"), "fieldtype": "Int", "width": 90},
+		{"fieldname": "completed", "label": _("Completed"), "fieldtype": "Int", "width": 100},
+		{"fieldname": "percent", "label": _("Percent"), "fieldtype": "Percent", "width": 100},
+	]
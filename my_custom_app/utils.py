@@ -0,0 +1,67 @@
+# Small helpers shared across the app's modules.
+import functools
+import pickle
+
+import frappe
+from redis import Redis
+
+
+def get_counters(key):
+    """
+    {field: int} of the cache hash `key` filled with hincrby. The counters are plain integers,
+    not pickled, so this bypasses frappe's hgetall, which would try to unpickle them.
+    """
+    cache = frappe.cache()
+    return {field.decode(): int(value) for field, value in Redis.hgetall(cache, cache.make_key(key)).items()}
+
+
+def get_hash_values(key, names, loader):
+    """
+    Read `names` from the cache hash `key` with one HMGET. Names not cached go to
+    loader(missing) -> {name: value}, whose result is written back with one HSET. Values are
+    pickled the same way frappe's hget/hset do, so both APIs can read them.
+    Returns ({name: value}, the names that were passed to the loader).
+    """
+    cache = frappe.cache()
+    redis_key = cache.make_key(key)
+    result = {}
+    missing = []
+    for name, raw in zip(names, cache.hmget(redis_key, names), strict=True):
+        if raw is None:
+            missing.append(name)
+        else:
+            result[name] = pickle.loads(raw)
+
+    if missing:
+        loaded = loader(missing)
+        if loaded:
+            Redis.hset(cache, redis_key, mapping={name: pickle.dumps(value) for name, value in loaded.items()})
+            result.update(loaded)
+    return result, missing
+
+
+def get_commit_batch(name, flush, factory=dict):
+    """
+    The collection `name` of the current transaction, created with `factory` on first use.
+    Once the transaction commits it is passed to flush(batch); a rollback drops it. Used to
+    defer cache invalidation and realtime events until the data they describe is visible.
+    """
+    batches = getattr(frappe.local, "commit_batches", None)
+    if batches is None:
+        batches = frappe.local.commit_batches = {}
+    batch = batches.get(name)
+    if batch is None:
+        batch = batches[name] = factory()
+        frappe.db.after_commit.add(functools.partial(_flush_batch, name, flush))
+        frappe.db.after_rollback.add(functools.partial(_drop_batch, name))
+    return batch
+
+
+def _flush_batch(name, flush):
+    batch = (getattr(frappe.local, "commit_batches", None) or {}).pop(name, None)
+    if batch is not None:
+        flush(batch)
+
+
+def _drop_batch(name):
+    (getattr(frappe.local, "commit_batches", None) or {}).pop(name, None)
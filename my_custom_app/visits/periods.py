@@ -0,0 +1,52 @@
+# Server-side resolution of Visit Target Detail period types to concrete dates.
+#
+# Mirrors public/js/sales_person.js so rows created by import, API or the bulk generator get
+# the same dates as rows entered in the form.
+from frappe.utils import (
+    add_days,
+    get_first_day,
+    get_last_day,
+    get_quarter_ending,
+    get_quarter_start,
+    getdate,
+    today,
+)
+
+PERIOD_TYPES = ("Current Month", "Current Quarter", "Next 30 Days", "Custom Range")
+
+
+def resolve_period(period_type, reference_date=None):
+    """
+    (start_date, end_date) of `period_type` around `reference_date` (default today), or None
+    for "Custom Range" and unknown types, whose dates are entered by hand.
+    """
+    reference_date = getdate(reference_date or today())
+
+    if period_type == "Current Month":
+        return get_first_day(reference_date), get_last_day(reference_date)
+    if period_type == "Current Quarter":
+        return get_quarter_start(reference_date), get_quarter_ending(reference_date)
+    if period_type == "Next 30 Days":
+        return reference_date, add_days(reference_date, 30)
+    return None
+
+
+def next_period_reference(period_type, reference_date=None):
+    """A date inside the period that follows the one containing `reference_date`."""
+    period = resolve_period(period_type, reference_date)
+    if not period:
+        return None
+    return add_days(period[1], 1)
+
+
+def set_missing_period_dates(row, reference_date=None):
+    """Fill start/end dates of a non-custom row that has none. Returns True if it changed."""
+    if row.get("start_date") and row.get("end_date"):
+        return False
+
+    period = resolve_period(row.get("period_type"), reference_date)
+    if not period:
+        return False
+
+    row.start_date, row.end_date = period
+    return True
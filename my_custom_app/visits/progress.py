@@ -0,0 +1,137 @@
+# Goal vs. completed visits across the sales team, aggregated in the database.
+#
+# Serves the "Visit Target Progress" script report and a JSON API. Only targets of Sales Persons
+# the user can read are counted (user permissions and permission query conditions), and results
+# are cached per filter set and permission scope; the cache generation is rotated whenever counters or targets change
+# (visit log submit/cancel, bulk sync, reconciliation, Sales Person save).
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.desk.reportview import get_match_cond
+from frappe.utils import cint, getdate
+
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.utils import get_commit_batch
+
+CACHE_KEY = "my_custom_app:visit_progress:"
+GENERATION_KEY = "my_custom_app:visit_progress_generation"
+CACHE_TTL = 6 * 60 * 60
+DEFAULT_PAGE_LENGTH = 500
+MAX_PAGE_LENGTH = 5000
+
+# group_by option -> columns it groups on
+GROUP_BY_COLUMNS = {
+    "Sales Person": ["vtd.parent"],
+    "Customer": ["vtd.customer"],
+    "Territory": ["vtd.territory"],
+    "Period": ["vtd.start_date", "vtd.end_date"],
+}
+SELECT_COLUMNS = {
+    "vtd.parent": "sales_person",
+    "vtd.customer": "customer",
+    "vtd.territory": "territory",
+    "vtd.start_date": "start_date",
+    "vtd.end_date": "end_date",
+}
+
+
+@frappe.whitelist()
+def get_visit_target_progress(filters=None, group_by=None, start=0, page_length=DEFAULT_PAGE_LENGTH):
+    """
+    Goal, completed and percent per sales person / customer / territory / period.
+
+    `filters` accepts sales_person, customer, territory, from_date and to_date (targets whose
+    period overlaps the range). `group_by` is one of GROUP_BY_COLUMNS, or empty for one line
+    per target. Returns {"data": [...], "total": number of groups}.
+    """
+    frappe.has_permission("Sales Person", "read", throw=True)
+    # Empty for users who can read every Sales Person, so they all share one cache entry
+    match_cond = get_match_cond("Sales Person")
+
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+    filters = frappe._dict(filters or {})
+    if group_by and group_by not in GROUP_BY_COLUMNS:
+        frappe.throw(_("Invalid Group By: {0}").format(group_by))
+    start = max(cint(start), 0)
+    page_length = min(max(cint(page_length), 1), MAX_PAGE_LENGTH)
+
+    cache_key = _cache_key(filters, group_by, start, page_length, match_cond)
+    result = frappe.cache().get_value(cache_key)
+    if result is None:
+        result = _aggregate(filters, group_by, start, page_length, match_cond)
+        frappe.cache().set_value(cache_key, result, expires_in_sec=CACHE_TTL)
+    return result
+
+
+def invalidate_progress_cache(*args, **kwargs):
+    """Rotate the cache generation once the current transaction commits (usable as a doc event)."""
+    get_commit_batch("visit_progress", _rotate_generation)
+
+
+@instrumented
+def on_sales_person_update(doc, method=None):
+    invalidate_progress_cache()
+
+
+def _rotate_generation(batch):
+    # Old entries are simply never read again and expire on their own
+    frappe.cache().set_value(GENERATION_KEY, frappe.generate_hash(length=10))
+
+
+def _cache_key(filters, group_by, start, page_length, match_cond=""):
+    generation = frappe.cache().get_value(GENERATION_KEY) or ""
+    payload = json.dumps([sorted(filters.items()), group_by, start, page_length, match_cond], default=str)
+    return CACHE_KEY + generation + ":" + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _aggregate(filters, group_by, start, page_length, match_cond=""):
+    conditions = ["vtd.parenttype = 'Sales Person'", "vtd.parentfield = 'custom_number_visit_target'"]
+    if match_cond:
+        # get_match_cond returns " and (...)" on `tabSales Person`
+        conditions.append(f"vtd.parent in (select `tabSales Person`.name from `tabSales Person` where 1=1 {match_cond})")
+    values = {"start": start, "page_length": page_length}
+
+    for fieldname, column in (("sales_person", "vtd.parent"), ("customer", "vtd.customer"), ("territory", "vtd.territory")):
+        if filters.get(fieldname):
+            conditions.append(f"{column} = %({fieldname})s")
+            values[fieldname] = filters.get(fieldname)
+    if filters.get("from_date"):
+        conditions.append("vtd.end_date >= %(from_date)s")
+        values["from_date"] = getdate(filters.from_date)
+    if filters.get("to_date"):
+        conditions.append("vtd.start_date <= %(to_date)s")
+        values["to_date"] = getdate(filters.to_date)
+
+    columns = GROUP_BY_COLUMNS[group_by] if group_by else list(SELECT_COLUMNS)
+    select = ", ".join(f"{column} as {SELECT_COLUMNS[column]}" for column in columns)
+    group = ", ".join(columns)
+    where = " and ".join(conditions)
+
+    data = frappe.db.sql(
+        f"""
+        select {select},
+            sum(vtd.goal_number_of_visits) as goal,
+            sum(coalesce(vtd.completed_visits, 0)) as completed,
+            round(100 * sum(coalesce(vtd.completed_visits, 0)) / nullif(sum(vtd.goal_number_of_visits), 0), 1) as percent
+        from `tabVisit Target Detail` vtd
+        where {where}
+        group by {group}
+        order by {group}
+        limit %(page_length)s offset %(start)s
+        """,
+        values,
+        as_dict=True,
+    )
+    total = frappe.db.sql(
+        f"""
+        select count(*) from (
+            select 1 from `tabVisit Target Detail` vtd where {where} group by {group}
+        ) grouped
+        """,
+        values,
+    )[0][0]
+
+    return {"data": data, "total": total}
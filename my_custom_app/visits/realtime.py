@@ -0,0 +1,74 @@
+# Coalesced realtime updates for visit target counters.
+#
+# Every target row touched during a request is collected and, after commit, announced to open
+# Sales Person forms as one `visit_target_update` event per sales person carrying only
+# [row name, completed visits] pairs, so the form patches its grid instead of reloading.
+# Across requests events are throttled: the first one in a window goes out immediately, later
+# ones are merged into a pending set that the scheduler drains once per tick (see scheduler_events
+# in hooks.py), so a burst of submits costs one event per sales person per minute, not one per
+# request.
+import frappe
+
+from my_custom_app.utils import get_commit_batch
+
+EVENT = "visit_target_update"
+# One scheduler tick: the trailing publish runs every minute
+WINDOW_SECONDS = 60
+WINDOW_KEY = "my_custom_app:visit_target_window:"
+PENDING_KEY = "my_custom_app:visit_target_pending:"
+# Sales persons with rows in their pending set
+PENDING_INDEX_KEY = "my_custom_app:visit_target_pending_index"
+
+
+def queue_target_refresh(sales_person, target_rows):
+    """Announce new counts for `target_rows` of `sales_person` once the transaction commits."""
+    pending = get_commit_batch("visit_target_refresh", _flush_request)
+    pending.setdefault(sales_person, set()).update(target_rows)
+
+
+def _flush_request(pending):
+    cache = frappe.cache()
+    for sales_person, target_rows in pending.items():
+        # Leading edge: nobody published for this sales person in the current window
+        if cache.set(cache.make_key(WINDOW_KEY + sales_person), 1, nx=True, ex=WINDOW_SECONDS):
+            publish_target_counts(sales_person, target_rows)
+        else:
+            pipe = cache.pipeline()
+            pipe.sadd(cache.make_key(PENDING_KEY + sales_person), *target_rows)
+            pipe.sadd(cache.make_key(PENDING_INDEX_KEY), sales_person)
+            pipe.execute()
+
+
+def publish_pending():
+    """Trailing edge, scheduled every minute: publish everything merged since the last tick."""
+    cache = frappe.cache()
+    index_key = cache.make_key(PENDING_INDEX_KEY)
+    pipe = cache.pipeline()
+    pipe.smembers(index_key)
+    pipe.delete(index_key)
+    sales_persons = pipe.execute()[0]
+
+    for sales_person in sorted(sales_person.decode() for sales_person in sales_persons):
+        # Rows added after this drain are in the next tick's index again
+        pending_key = cache.make_key(PENDING_KEY + sales_person)
+        pipe = cache.pipeline()
+        pipe.smembers(pending_key)
+        pipe.delete(pending_key)
+        target_rows = pipe.execute()[0]
+        if target_rows:
+            publish_target_counts(sales_person, {row.decode() for row in target_rows})
+
+
+def publish_target_counts(sales_person, target_rows):
+    rows = frappe.get_all(
+        "Visit Target Detail",
+        filters={"name": ["in", list(target_rows)]},
+        fields=["name", "completed_visits"],
+        as_list=True,
+    )
+    frappe.publish_realtime(
+        EVENT,
+        {"sales_person": sales_person, "rows": rows},
+        doctype="Sales Person",
+        docname=sales_person,
+    )
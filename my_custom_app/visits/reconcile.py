@@ -0,0 +1,157 @@
+# Rebuild Visit Target Detail.completed_visits from submitted Sales Visit Logs.
+#
+# The counters are maintained incrementally on submit/cancel; this recount repairs drift (failed
+# updates, edited target dates, amendments) with a single aggregate query and only writes rows
+# whose stored count differs. Incremental runs only look at targets touched since the last run.
+import frappe
+from frappe.utils import cint, now
+
+from my_custom_app.visits.progress import invalidate_progress_cache
+
+WATERMARK_KEY = "my_custom_app_visit_reconcile_watermark"
+UPDATE_BATCH_SIZE = 500
+
+
+@frappe.whitelist()
+def reconcile_visit_targets(full=0):
+    """Queue a recount of visit target counters (incremental unless `full`)."""
+    frappe.only_for(("System Manager", "Sales Manager"))
+    frappe.enqueue(
+        "my_custom_app.visits.reconcile.run_reconciliation",
+        queue="long",
+        full=cint(full),
+        job_id="my_custom_app:visit_reconcile",
+        deduplicate=True,
+    )
+
+
+def reconcile_incremental():
+    # Scheduled hourly (see scheduler_events in hooks.py)
+    run_reconciliation(full=False)
+
+
+def reconcile_full():
+    # Scheduled daily (see scheduler_events in hooks.py)
+    run_reconciliation(full=True)
+
+
+def run_reconciliation(full=False):
+    """Recount completed visits and fix the rows that drifted. Returns the number of rows updated."""
+    started_at = now()
+    since = None if full else frappe.db.get_global(WATERMARK_KEY)
+
+    drifted = get_drifted_targets(since)
+    for start in range(0, len(drifted), UPDATE_BATCH_SIZE):
+        _update_counts(drifted[start : start + UPDATE_BATCH_SIZE])
+    if drifted:
+        invalidate_progress_cache()
+
+    frappe.db.set_global(WATERMARK_KEY, started_at)
+    frappe.db.commit()
+    return len(drifted)
+
+
+def get_drifted_targets(since=None):
+    """
+    [(target_row, actual_count)] for every target row whose completed_visits does not match
+    the submitted visit logs in its date range. With `since`, only rows modified after it or
+    with visit logs modified after it are recounted.
+    """
+    return _get_drifted_customer_targets(since) + _get_drifted_territory_targets(since)
+
+
+def _changed_since_condition(since, visit_match):
+    if not since:
+        return ""
+    return f"""
+        and (
+            vtd.modified > %(since)s
+            or exists (
+                select 1 from `tabSales Visit Log` changed
+                where changed.modified > %(since)s
+                    and changed.sales_person = vtd.parent
+                    and changed.visit_date between vtd.start_date and vtd.end_date
+                    {visit_match}
+            )
+        )
+    """
+
+
+def _get_drifted_customer_targets(since):
+    condition = _changed_since_condition(since, "and changed.customer = vtd.customer")
+    return list(
+        frappe.db.sql(
+            f"""
+            select vtd.name, count(svl.name)
+            from `tabVisit Target Detail` vtd
+            left join `tabSales Visit Log` svl
+                on svl.docstatus = 1
+                and svl.sales_person = vtd.parent
+                and svl.customer = vtd.customer
+                and svl.visit_date between vtd.start_date and vtd.end_date
+            where vtd.parenttype = 'Sales Person'
+                and vtd.parentfield = 'custom_number_visit_target'
+                and ifnull(vtd.customer, '') != ''
+                and vtd.start_date is not null
+                and vtd.end_date is not null
+                {condition}
+            group by vtd.name, vtd.completed_visits
+            having count(svl.name) != coalesce(vtd.completed_visits, 0)
+            """,
+            {"since": since},
+        )
+    )
+
+
+def _get_drifted_territory_targets(since):
+    # Territory-only targets count visits to customers anywhere under the target territory,
+    # matched with the Territory nested set (lft/rgt)
+    condition = _changed_since_condition(since, "")
+    return list(
+        frappe.db.sql(
+            f"""
+            select vtd.name, count(svl.name)
+            from `tabVisit Target Detail` vtd
+            join `tabTerritory` target_territory on target_territory.name = vtd.territory
+            left join (
+                `tabSales Visit Log` svl
+                join `tabCustomer` customer on customer.name = svl.customer
+                join `tabTerritory` customer_territory on customer_territory.name = customer.territory
+            )
+                on svl.docstatus = 1
+                and svl.sales_person = vtd.parent
+                and svl.visit_date between vtd.start_date and vtd.end_date
+                and customer_territory.lft >= target_territory.lft
+                and customer_territory.rgt <= target_territory.rgt
+            where vtd.parenttype = 'Sales Person'
+                and vtd.parentfield = 'custom_number_visit_target'
+                and ifnull(vtd.customer, '') = ''
+                and vtd.start_date is not null
+                and vtd.end_date is not null
+                {condition}
+            group by vtd.name, vtd.completed_visits
+            having count(svl.name) != coalesce(vtd.completed_visits, 0)
+            """,
+            {"since": since},
+        )
+    )
+
+
+def _update_counts(rows):
+    # One UPDATE ... CASE per batch instead of one statement per row
+    values = {}
+    cases = []
+    for i, (name, count) in enumerate(rows):
+        values[f"name_{i}"] = name
+        values[f"count_{i}"] = count
+        cases.append(f"when %(name_{i})s then %(count_{i})s")
+
+    names = ", ".join(f"%(name_{i})s" for i in range(len(rows)))
+    frappe.db.sql(
+        f"""
+        update `tabVisit Target Detail`
+        set completed_visits = case name {" ".join(cases)} end
+        where name in ({names})
+        """,
+        values,
+    )
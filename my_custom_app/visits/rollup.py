@@ -0,0 +1,161 @@
+# Daily visit rollup: one Sales Visit Daily Rollup row per (visit date, sales person, customer,
+# territory) holding the number of submitted Sales Visit Logs.
+#
+# Kept current on Sales Visit Log submit/cancel (one statement per visit, or per chunk during bulk
+# sync) and rebuilt from the logs by date range, one committed chunk of days at a time. Dashboards
+# read this table instead of counting Sales Visit Log, so they only scan the rows of the dates
+# they show, however long the visit history grows. Row names are a hash of the key, so the
+# incremental upsert and the bulk rebuild address the same row.
+import hashlib
+
+import frappe
+from frappe.utils import add_days, getdate, now, today
+
+REBUILD_CHUNK_DAYS = 31
+# The daily repair rebuilds this many days back (late submits, cancels, amendments)
+RECENT_DAYS = 35
+
+
+def rollup_name(visit_date, sales_person, customer, territory):
+    # Must stay in line with the sha1(concat_ws(...)) of _rebuild_range
+    key = "|".join(str(value or "") for value in (getdate(visit_date), sales_person, customer, territory))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def add_visit(doc, delta):
+    """
+    Count the Sales Visit Log `doc` in (delta 1) or out (delta -1) of its rollup row. Bulk sync
+    sets doc.flags.visit_rollup_deltas to collect the deltas and applies them once per chunk.
+    """
+    key = (getdate(doc.visit_date), doc.sales_person, doc.customer, doc.get("territory"))
+    deltas = doc.flags.visit_rollup_deltas
+    if deltas is not None:
+        deltas[key] = deltas.get(key, 0) + delta
+        return
+    apply_rollup_deltas({key: delta})
+
+
+def apply_rollup_deltas(deltas):
+    """Apply {(visit_date, sales_person, customer, territory): delta} to the rollup table."""
+    increments = {key: delta for key, delta in deltas.items() if delta > 0}
+    if increments:
+        _increment(increments)
+
+    # A cancel only ever decrements a row its submit created
+    for key, delta in deltas.items():
+        if delta < 0:
+            frappe.db.sql(
+                """
+                update `tabSales Visit Daily Rollup`
+                set visit_count = greatest(visit_count + %(delta)s, 0), modified = %(modified)s
+                where name = %(name)s
+                """,
+                {"delta": delta, "modified": now(), "name": rollup_name(*key)},
+            )
+
+
+def _increment(increments):
+    # One multi-row upsert: new keys are inserted, existing rows are incremented in place
+    values = {"now": now(), "user": frappe.session.user}
+    rows = []
+    for i, ((visit_date, sales_person, customer, territory), delta) in enumerate(increments.items()):
+        values.update(
+            {
+                f"name_{i}": rollup_name(visit_date, sales_person, customer, territory),
+                f"visit_date_{i}": visit_date,
+                f"sales_person_{i}": sales_person,
+                f"customer_{i}": customer,
+                f"territory_{i}": territory,
+                f"delta_{i}": delta,
+            }
+        )
+        rows.append(
+            f"(%(name_{i})s, %(visit_date_{i})s, %(sales_person_{i})s, %(customer_{i})s, %(territory_{i})s,"
+            f" %(delta_{i})s, %(now)s, %(now)s, %(user)s, %(user)s)"
+        )
+
+    frappe.db.sql(
+        f"""
+        insert into `tabSales Visit Daily Rollup`
+            (name, visit_date, sales_person, customer, territory, visit_count, creation, modified, owner, modified_by)
+        values {", ".join(rows)}
+        on duplicate key update
+            visit_count = visit_count + values(visit_count),
+            modified = values(modified)
+        """,
+        values,
+    )
+
+
+@frappe.whitelist()
+def rebuild_visit_rollup(from_date=None, to_date=None):
+    """Queue a rebuild of the rollup from submitted Sales Visit Logs (every date unless a range is given)."""
+    frappe.only_for(("System Manager", "Sales Manager"))
+    frappe.enqueue(
+        "my_custom_app.visits.rollup.run_rebuild",
+        queue="long",
+        timeout=4 * 3600,
+        from_date=from_date,
+        to_date=to_date,
+        job_id="my_custom_app:visit_rollup_rebuild",
+        deduplicate=True,
+    )
+
+
+def rebuild_recent():
+    # Scheduled daily (see scheduler_events in hooks.py)
+    run_rebuild(add_days(today(), -RECENT_DAYS), today())
+
+
+def run_rebuild(from_date=None, to_date=None):
+    """
+    Recompute the rollup rows of every visit date between `from_date` and `to_date` (both
+    default to the full range of logs and rollup rows). Returns the number of days covered.
+    """
+    if not from_date or not to_date:
+        first, last = _date_range()
+        from_date = from_date or first
+        to_date = to_date or last
+    if not from_date or not to_date:
+        return 0
+
+    start, end = getdate(from_date), getdate(to_date)
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(add_days(chunk_start, REBUILD_CHUNK_DAYS - 1), end)
+        _rebuild_range(chunk_start, chunk_end)
+        # Each chunk swaps its rows in one transaction, so dashboards never see a half-built day
+        frappe.db.commit()
+        chunk_start = add_days(chunk_end, 1)
+
+    return (end - start).days + 1
+
+
+def _date_range():
+    logs = frappe.db.sql("select min(visit_date), max(visit_date) from `tabSales Visit Log` where docstatus = 1")[0]
+    rollup = frappe.db.sql("select min(visit_date), max(visit_date) from `tabSales Visit Daily Rollup`")[0]
+    firsts = [date for date in (logs[0], rollup[0]) if date]
+    lasts = [date for date in (logs[1], rollup[1]) if date]
+    return (min(firsts) if firsts else None), (max(lasts) if lasts else None)
+
+
+def _rebuild_range(start, end):
+    values = {"start": start, "end": end, "now": now(), "user": frappe.session.user}
+    frappe.db.sql(
+        "delete from `tabSales Visit Daily Rollup` where visit_date between %(start)s and %(end)s", values
+    )
+    frappe.db.sql(
+        """
+        insert into `tabSales Visit Daily Rollup`
+            (name, visit_date, sales_person, customer, territory, visit_count, creation, modified, owner, modified_by)
+        select
+            sha1(concat_ws('|', visit_date, coalesce(sales_person, ''), coalesce(customer, ''), coalesce(territory, ''))),
+            visit_date, max(sales_person), max(customer), max(territory), count(*),
+            %(now)s, %(now)s, %(user)s, %(user)s
+        from `tabSales Visit Log`
+        where docstatus = 1
+            and visit_date between %(start)s and %(end)s
+        group by visit_date, coalesce(sales_person, ''), coalesce(customer, ''), coalesce(territory, '')
+        """,
+        values,
+    )
@@ -0,0 +1,196 @@
+# Bulk / offline-sync ingestion for Sales Visit Logs.
+#
+# Field reps sync many visits at once. Each visit carries a client-side idempotency key so a
+# retried sync never creates a visit twice, while a visit that failed is tried again. Visits are inserted and submitted in chunks;
+# visit target counters are aggregated per (sales person, target row) and the daily rollup per
+# key, and both are applied once per chunk.
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from my_custom_app.test_application.doctype.sales_visit_log.sales_visit_log import apply_visit_count_delta
+from my_custom_app.visits.realtime import queue_target_refresh
+from my_custom_app.visits.rollup import apply_rollup_deltas
+from my_custom_app.visits.targets import find_visit_targets
+
+CHUNK_SIZE = 100
+# Batches larger than this are processed in a background job
+ENQUEUE_THRESHOLD = 200
+RESULT_CACHE_KEY = "my_custom_app:visit_sync:"
+RESULT_TTL = 24 * 60 * 60
+
+VISIT_FIELDS = ("sales_person", "customer", "visit_date", "notes")
+
+
+@frappe.whitelist()
+def sync_visits(visits, submit=1):
+    """
+    Create (and by default submit) many Sales Visit Logs in one call.
+
+    `visits` is a list of {"idempotency_key", "sales_person", "customer", "visit_date", "notes"}.
+    Small batches return the per-visit results directly. Large batches are enqueued and return
+    a `sync_id`; the results are published to the user on `visit_sync_complete` and can be
+    fetched with `get_sync_result`.
+    """
+    frappe.has_permission("Sales Visit Log", "create", throw=True)
+    if cint(submit):
+        frappe.has_permission("Sales Visit Log", "submit", throw=True)
+
+    if isinstance(visits, str):
+        visits = json.loads(visits)
+
+    if len(visits) <= ENQUEUE_THRESHOLD:
+        return {"queued": False, "results": ingest_visits(visits, submit=submit)}
+
+    sync_id = frappe.generate_hash(length=12)
+    frappe.enqueue(
+        "my_custom_app.visits.sync.run_sync_job",
+        queue="long",
+        timeout=3600,
+        sync_id=sync_id,
+        visits=visits,
+        submit=submit,
+        user=frappe.session.user,
+    )
+    return {"queued": True, "sync_id": sync_id}
+
+
+@frappe.whitelist()
+def get_sync_result(sync_id):
+    result = frappe.cache().get_value(RESULT_CACHE_KEY + sync_id)
+    if result and result["user"] != frappe.session.user:
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+    return result
+
+
+def run_sync_job(sync_id, visits, submit, user):
+    results = ingest_visits(visits, submit=submit, commit=True)
+    frappe.cache().set_value(
+        RESULT_CACHE_KEY + sync_id, {"user": user, "results": results}, expires_in_sec=RESULT_TTL
+    )
+    frappe.publish_realtime("visit_sync_complete", {"sync_id": sync_id}, user=user)
+
+
+def ingest_visits(visits, submit=1, commit=False):
+    """
+    Insert (and submit) `visits`, skipping idempotency keys already in the database; with
+    `submit`, drafts already created under a key are submitted instead. Within the batch, a key
+    whose visit fails is retried with its next occurrence, and the occurrences after a success
+    are duplicates of it. Returns one {"idempotency_key", "status", "name", "error"} result per
+    input visit.
+    """
+    submit = cint(submit)
+    results = [None] * len(visits)
+    occurrences = {}
+
+    for i, visit in enumerate(visits):
+        key = visit.get("idempotency_key")
+        if not key:
+            results[i] = _result(key, "error", error=_("Idempotency Key is required"))
+        else:
+            occurrences.setdefault(key, []).append(i)
+
+    drafts = {}
+    for key, (name, docstatus) in _existing_keys(list(occurrences)).items():
+        if docstatus == 0 and submit:
+            drafts[key] = name
+        else:
+            for i in occurrences.pop(key):
+                results[i] = _result(key, "duplicate", name=name)
+
+    # One occurrence per key per round; the next round retries the keys that failed
+    attempts = {key: 0 for key in occurrences}
+    pending = [indices[0] for indices in occurrences.values()]
+    while pending:
+        for start in range(0, len(pending), CHUNK_SIZE):
+            _ingest_chunk(visits, pending[start : start + CHUNK_SIZE], results, submit, drafts)
+            if commit:
+                frappe.db.commit()
+
+        retry = []
+        for i in pending:
+            key = visits[i]["idempotency_key"]
+            attempts[key] += 1
+            if results[i]["status"] == "error" and attempts[key] < len(occurrences[key]):
+                retry.append(occurrences[key][attempts[key]])
+        pending = retry
+
+    # Occurrences after the one that went in point at the visit it created
+    for key, indices in occurrences.items():
+        winner = results[indices[attempts[key] - 1]]
+        for i in indices[attempts[key] :]:
+            results[i] = _result(key, "duplicate", name=winner["name"])
+
+    return results
+
+
+def _ingest_chunk(visits, indices, results, submit, drafts):
+    deltas = {}
+    rollup_deltas = {}
+    targets = find_visit_targets(
+        [(visits[i].get("sales_person"), visits[i].get("customer"), visits[i].get("visit_date")) for i in indices]
+    )
+
+    for i, target_rows in zip(indices, targets, strict=True):
+        visit = visits[i]
+        key = visit["idempotency_key"]
+        savepoint = f"visit_sync_{i}"
+        frappe.db.savepoint(savepoint)
+        try:
+            if key in drafts:
+                # A draft from an earlier sync: submit it as saved, its targets follow its own fields
+                doc = frappe.get_doc("Sales Visit Log", drafts[key])
+                target_rows = None
+            else:
+                doc = frappe.get_doc(
+                    {
+                        "doctype": "Sales Visit Log",
+                        "idempotency_key": key,
+                        **{field: visit.get(field) for field in VISIT_FIELDS},
+                    }
+                )
+            # Counted only once the visit is safely in, so a failed submit leaves no delta behind
+            doc.flags.visit_target_deltas = {}
+            doc.flags.visit_rollup_deltas = {}
+            doc.flags.visit_target_rows = target_rows
+            if doc.is_new():
+                doc.insert()
+            if submit:
+                doc.submit()
+            for target, delta in doc.flags.visit_target_deltas.items():
+                deltas[target] = deltas.get(target, 0) + delta
+            for rollup_key, delta in doc.flags.visit_rollup_deltas.items():
+                rollup_deltas[rollup_key] = rollup_deltas.get(rollup_key, 0) + delta
+            results[i] = _result(key, "submitted" if submit else "created", name=doc.name)
+        except Exception as e:
+            frappe.db.rollback(save_point=savepoint)
+            frappe.clear_messages()
+            results[i] = _result(key, "error", error=str(e))
+
+    # One atomic update per target row, regardless of how many visits in the chunk hit it
+    for (sales_person, target_row), delta in deltas.items():
+        if delta:
+            apply_visit_count_delta(target_row, delta)
+            queue_target_refresh(sales_person, [target_row])
+    apply_rollup_deltas(rollup_deltas)
+
+
+def _existing_keys(keys):
+    """{idempotency_key: (name, docstatus)} of the Sales Visit Logs already created under `keys`."""
+    if not keys:
+        return {}
+    return {
+        key: (name, docstatus)
+        for key, name, docstatus in frappe.get_all(
+            "Sales Visit Log",
+            filters={"idempotency_key": ["in", keys]},
+            fields=["idempotency_key", "name", "docstatus"],
+            as_list=True,
+        )
+    }
+
+
+def _result(key, status, name=None, error=None):
+    return {"idempotency_key": key, "status": status, "name": name, "error": error}
@@ -0,0 +1,206 @@
+# Bulk creation of Visit Target Detail rows, e.g. "next quarter for every rep in territory X".
+#
+# Works set-based: existing targets for all affected sales people are read with one query,
+# overlaps are checked in memory and the new rows are written with one bulk insert, instead of
+# loading and saving every Sales Person document.
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now
+from frappe.utils.nestedset import get_descendants_of
+
+from my_custom_app.visits.periods import next_period_reference, resolve_period
+from my_custom_app.visits.progress import invalidate_progress_cache
+from my_custom_app.visits.targets import VISIT_TARGET_FIELD
+
+TARGET_FIELDS = (
+    "name", "creation", "modified", "modified_by", "owner", "docstatus",
+    "parent", "parentfield", "parenttype", "idx",
+    "customer", "territory", "period_type", "start_date", "end_date",
+    "goal_number_of_visits", "completed_visits",
+)
+
+
+@frappe.whitelist()
+def generate_visit_targets(
+    period_type,
+    goal_number_of_visits,
+    sales_persons=None,
+    customers=None,
+    customer_territory=None,
+    territory=None,
+    reference_date=None,
+    next_period=0,
+):
+    """
+    Create one target per sales person and per customer (or one territory-only target) for the
+    period `period_type` around `reference_date`, or the period after it with `next_period`.
+
+    Sales people default to every enabled, non-group Sales Person the user can write; listed ones
+    must exist, not be groups and be writable by the user. Customers are given explicitly
+    or as every customer under `customer_territory`; `territory` creates territory-only targets.
+    Targets that already exist for the same period are skipped; targets that would overlap an
+    existing one are skipped and reported. Returns {"created", "skipped", "conflicts"}.
+    """
+    frappe.has_permission("Sales Person", "write", throw=True)
+
+    sales_persons = list(dict.fromkeys(_parse_list(sales_persons)))
+    if sales_persons:
+        _validate_sales_persons(sales_persons)
+    else:
+        sales_persons = [
+            name
+            for name in frappe.get_all("Sales Person", filters={"enabled": 1, "is_group": 0}, pluck="name")
+            if frappe.has_permission("Sales Person", "write", doc=name)
+        ]
+    if not sales_persons:
+        frappe.throw(_("No Sales Person to create targets for."))
+    customers = _parse_list(customers)
+    _validate_names("Customer", customers)
+    if territory:
+        _validate_names("Territory", [territory])
+    if customer_territory:
+        territories = [customer_territory, *get_descendants_of("Territory", customer_territory)]
+        customers += frappe.get_all("Customer", filters={"territory": ["in", territories]}, pluck="name")
+    if not customers and not territory:
+        frappe.throw(_("Select customers, a customer territory or a territory to create targets for."))
+
+    if cint(next_period):
+        reference_date = next_period_reference(period_type, reference_date)
+    period = resolve_period(period_type, reference_date)
+    if not period:
+        frappe.throw(_("Period Type {0} cannot be generated; its dates are entered by hand.").format(period_type))
+    start_date, end_date = period
+
+    # (customer, territory) pairs each sales person gets a target for
+    targets = [(customer, None) for customer in dict.fromkeys(customers)]
+    if territory:
+        targets.append((None, territory))
+
+    existing = _get_overlapping_targets(sales_persons, targets, start_date, end_date)
+    next_idx = _get_next_idx(sales_persons)
+
+    rows, skipped, conflicts = [], 0, []
+    timestamp, user = now(), frappe.session.user
+    for sales_person in sales_persons:
+        for customer, target_territory in targets:
+            overlapping = existing.get((sales_person, customer, target_territory))
+            if overlapping:
+                if overlapping == (start_date, end_date):
+                    skipped += 1
+                else:
+                    conflicts.append(
+                        {"sales_person": sales_person, "customer": customer, "territory": target_territory}
+                    )
+                continue
+
+            rows.append(
+                (
+                    frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+                    sales_person, VISIT_TARGET_FIELD, "Sales Person", next_idx[sales_person],
+                    customer, target_territory, period_type, start_date, end_date,
+                    cint(goal_number_of_visits), 0,
+                )
+            )
+            next_idx[sales_person] += 1
+
+    if rows:
+        frappe.db.bulk_insert("Visit Target Detail", TARGET_FIELDS, rows)
+        # Forms opened before this must reload instead of saving (and dropping) the new rows
+        touched = list({row[6] for row in rows})
+        frappe.db.sql(
+            "update `tabSales Person` set modified = %s where name in %s", (timestamp, tuple(touched))
+        )
+        invalidate_progress_cache()
+        # Visits already logged inside the new periods are counted by an incremental recount
+        frappe.enqueue(
+            "my_custom_app.visits.reconcile.run_reconciliation",
+            queue="long",
+            enqueue_after_commit=True,
+            job_id="my_custom_app:visit_reconcile",
+            deduplicate=True,
+        )
+
+    return {"created": len(rows), "skipped": skipped, "conflicts": conflicts}
+
+
+def _validate_sales_persons(sales_persons):
+    # Rows are bulk inserted under each of them, so a typo or a group would leave orphan targets
+    is_group = dict(
+        frappe.get_all(
+            "Sales Person", filters={"name": ["in", sales_persons]}, fields=["name", "is_group"], as_list=True
+        )
+    )
+    _validate_names("Sales Person", sales_persons, found=is_group)
+    groups = [name for name in sales_persons if is_group[name]]
+    if groups:
+        frappe.throw(_("Targets cannot be created for group Sales Persons: {0}").format(", ".join(groups)))
+    denied = [name for name in sales_persons if not frappe.has_permission("Sales Person", "write", doc=name)]
+    if denied:
+        frappe.throw(
+            _("Not permitted to change the targets of: {0}").format(", ".join(denied)), frappe.PermissionError
+        )
+
+
+def _validate_names(doctype, names, found=None):
+    if not names:
+        return
+    if found is None:
+        found = set(frappe.get_all(doctype, filters={"name": ["in", names]}, pluck="name"))
+    missing = [name for name in names if name not in found]
+    if missing:
+        frappe.throw(_("{0} not found: {1}").format(_(doctype), ", ".join(missing)), frappe.DoesNotExistError)
+
+
+def _get_overlapping_targets(sales_persons, targets, start_date, end_date):
+    """{(sales person, customer, territory): (start, end)} of existing rows overlapping the period."""
+    customers = [customer for customer, _territory in targets if customer]
+    territories = [territory for _customer, territory in targets if territory]
+    or_filters = []
+    if customers:
+        or_filters.append(["customer", "in", customers])
+    if territories:
+        or_filters.append(["territory", "in", territories])
+
+    rows = frappe.get_all(
+        "Visit Target Detail",
+        filters={
+            "parenttype": "Sales Person",
+            "parentfield": VISIT_TARGET_FIELD,
+            "parent": ["in", sales_persons],
+            "start_date": ["<=", end_date],
+            "end_date": [">=", start_date],
+        },
+        or_filters=or_filters,
+        fields=["parent", "customer", "territory", "start_date", "end_date"],
+    )
+
+    existing = {}
+    for row in rows:
+        # Customer targets are keyed by customer alone, like check_visit_target_details does
+        key = (row.parent, row.customer, None) if row.customer else (row.parent, None, row.territory)
+        existing[key] = (row.start_date, row.end_date)
+    return existing
+
+
+def _get_next_idx(sales_persons):
+    next_idx = dict.fromkeys(sales_persons, 1)
+    for parent, max_idx in frappe.db.sql(
+        """
+        select parent, max(idx) from `tabVisit Target Detail`
+        where parenttype = 'Sales Person' and parentfield = %s and parent in %s
+        group by parent
+        """,
+        (VISIT_TARGET_FIELD, tuple(sales_persons)),
+    ):
+        next_idx[parent] = (max_idx or 0) + 1
+    return next_idx
+
+
+def _parse_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = json.loads(value) if value.startswith("[") else [v.strip() for v in value.split(",")]
+    return [v for v in value if v]
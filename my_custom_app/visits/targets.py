@@ -0,0 +1,116 @@
+# Resolve (sales person, customer, visit date) to the Visit Target Detail rows it counts towards.
+#
+# A visit counts towards the sales person's target for that customer and towards every
+# territory-only target whose territory is the customer's territory or one of its ancestors.
+# Backed by the composite index on Visit Target Detail (parent, customer, start_date, end_date),
+# see on_doctype_update in visit_target_detail.py, and by the cached territory tree.
+from bisect import bisect_right
+
+import frappe
+from frappe.utils import getdate
+
+from my_custom_app.visits.territory_cache import get_customer_territories, get_territory_with_ancestors
+
+VISIT_TARGET_FIELD = "custom_number_visit_target" # Child table fieldname on Sales Person
+
+
+def find_visit_target_rows(sales_person, customer, visit_date):
+    """Names of the Visit Target Detail rows of `sales_person` that a visit to `customer` on `visit_date` counts towards."""
+    return find_visit_targets([(sales_person, customer, visit_date)])[0]
+
+
+def find_visit_targets(visits):
+    """
+    Batched `find_visit_target_rows`: `visits` is a list of (sales_person, customer, visit_date)
+    and the result holds the list of matching target row names for each, in order.
+    Candidate rows are read with one query per target kind, then each visit is resolved with
+    a binary search per customer / territory.
+    """
+    visits = [(sp, customer, getdate(date) if date else None) for sp, customer, date in visits]
+    keyed = [v for v in visits if v[0] and v[1] and v[2]]
+    if not keyed:
+        return [[] for _v in visits]
+
+    sales_persons = list({v[0] for v in keyed})
+    date_filters = {
+        "start_date": ["<=", max(v[2] for v in keyed)],
+        "end_date": [">=", min(v[2] for v in keyed)],
+    }
+
+    customer_ranges = _ranges_by_key(
+        _get_target_rows(sales_persons, "customer", list({v[1] for v in keyed}), date_filters),
+        "customer",
+    )
+
+    customer_territories = get_customer_territories(v[1] for v in keyed)
+    territory_chains = {
+        territory: get_territory_with_ancestors(territory)
+        for territory in set(customer_territories.values())
+        if territory
+    }
+    all_territories = list({t for chain in territory_chains.values() for t in chain})
+    territory_ranges = {}
+    if all_territories:
+        territory_ranges = _ranges_by_key(
+            _get_target_rows(
+                sales_persons, "territory", all_territories, date_filters, customer_filter=["is", "not set"]
+            ),
+            "territory",
+        )
+
+    result = []
+    for sales_person, customer, visit_date in visits:
+        matches = []
+        if sales_person and customer and visit_date:
+            match = _find_covering(customer_ranges.get((sales_person, customer)), visit_date)
+            if match:
+                matches.append(match)
+
+            for territory in territory_chains.get(customer_territories.get(customer), ()):
+                match = _find_covering(territory_ranges.get((sales_person, territory)), visit_date)
+                if match:
+                    matches.append(match)
+        result.append(matches)
+
+    return result
+
+
+def _get_target_rows(sales_persons, fieldname, values, date_filters, customer_filter=None):
+    filters = {
+        "parenttype": "Sales Person",
+        "parentfield": VISIT_TARGET_FIELD,
+        "parent": ["in", sales_persons],
+        fieldname: ["in", values],
+        **date_filters,
+    }
+    if customer_filter:
+        filters["customer"] = customer_filter
+
+    return frappe.get_all(
+        "Visit Target Detail",
+        filters=filters,
+        fields=["name", "parent", fieldname, "start_date", "end_date"],
+        order_by="start_date asc, idx asc",
+    )
+
+
+def _ranges_by_key(rows, fieldname):
+    # (sales person, customer or territory) -> (start dates, rows), sorted by start date
+    ranges = {}
+    for row in rows:
+        starts, entries = ranges.setdefault((row.parent, row[fieldname]), ([], []))
+        starts.append(row.start_date)
+        entries.append(row)
+    return ranges
+
+
+def _find_covering(ranges, visit_date):
+    if not ranges:
+        return None
+    starts, entries = ranges
+    # Latest range starting on or before the visit; ranges of one customer or territory never
+    # overlap (check_visit_target_details), so it is the only candidate
+    pos = bisect_right(starts, visit_date) - 1
+    if pos >= 0 and entries[pos].end_date >= visit_date:
+        return entries[pos].name
+    return None
@@ -0,0 +1,98 @@
+# Cached territory lookups for visit target matching.
+#
+# customer -> territory lives in a Redis hash filled on demand; the Territory tree (name -> parent)
+# is cached whole, as it is small and read on every submit. Both are dropped by the
+# Customer / Territory doc_events registered in hooks.py, once their transaction commits.
+import frappe
+
+from my_custom_app.hook_metrics import instrumented
+from my_custom_app.utils import get_commit_batch, get_hash_values
+
+CUSTOMER_TERRITORY_KEY = "my_custom_app:customer_territory"
+TERRITORY_TREE_KEY = "my_custom_app:territory_tree"
+
+
+def get_customer_territories(customers):
+    """Return {customer: territory} for the given customers."""
+    customers = list({c for c in customers if c})
+    if not customers:
+        return {}
+
+    # One HMGET for all customers, one query for those not cached yet
+    return get_hash_values(CUSTOMER_TERRITORY_KEY, customers, _load_customer_territories)[0]
+
+
+def _load_customer_territories(customers):
+    territories = dict(
+        frappe.get_all("Customer", filters={"name": ["in", customers]}, fields=["name", "territory"], as_list=True)
+    )
+    # Customers that no longer exist are cached too, as None
+    return {customer: territories.get(customer) for customer in customers}
+
+
+def get_territory_tree():
+    """{territory: parent_territory} for the whole Territory tree."""
+    return frappe.cache().get_value(TERRITORY_TREE_KEY, generator=_load_territory_tree)
+
+
+def get_territory_with_ancestors(territory):
+    """`territory` followed by its ancestors up to the root, read from the cached tree."""
+    tree = get_territory_tree()
+    chain = []
+    while territory and territory in tree and territory not in chain:
+        chain.append(territory)
+        territory = tree[territory]
+    return chain
+
+
+def _load_territory_tree():
+    return dict(frappe.get_all("Territory", fields=["name", "parent_territory"], as_list=True))
+
+
+def clear_territory_cache():
+    frappe.cache().delete_value([CUSTOMER_TERRITORY_KEY, TERRITORY_TREE_KEY])
+
+
+def _invalidate(customers=None):
+    """
+    Drop `customers` (the whole cache when None) once the current transaction commits, so no
+    other worker can re-cache the old committed territory in between.
+    """
+    pending = get_commit_batch("territory_cache", _flush_invalidations, set)
+    if customers is None:
+        pending.add(None)
+    else:
+        pending.update(name for name in customers if name)
+
+
+def _flush_invalidations(pending):
+    if None in pending:
+        clear_territory_cache()
+    else:
+        frappe.cache().hdel(CUSTOMER_TERRITORY_KEY, list(pending))
+
+
+# Document events (see hooks.py)
+
+
+@instrumented
+def on_customer_update(doc, method=None):
+    if doc.has_value_changed("territory"):
+        _invalidate([doc.name])
+
+
+@instrumented
+def on_customer_rename(doc, method=None, old=None, new=None, merge=False):
+    _invalidate([old, new])
+
+
+@instrumented
+def on_customer_trash(doc, method=None):
+    _invalidate([doc.name])
+
+
+@instrumented
+def on_territory_change(doc, method=None, *args, **kwargs):
+    # Any insert, move, rename or delete shifts lft/rgt of other nodes; renames also rewrite
+    # Customer.territory in the database without Customer events
+    _invalidate()
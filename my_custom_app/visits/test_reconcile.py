@@ -0,0 +1,50 @@
+# Copyright (c) 2026, DON and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from my_custom_app.test_application.doctype.sales_visit_log.test_sales_visit_log import (
+    TEST_CUSTOMER,
+    TEST_SALES_PERSON,
+    get_target_row,
+    make_visit,
+    make_visit_fixtures,
+)
+from my_custom_app.visits.reconcile import get_drifted_targets, run_reconciliation
+from my_custom_app.visits.sync import ingest_visits
+
+
+class TestReconcile(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        make_visit_fixtures()
+
+    def test_recount_restores_counts_after_direct_edits(self):
+        ingest_visits([make_visit(), make_visit()])
+        target = get_target_row()
+        actual = frappe.db.count(
+            "Sales Visit Log",
+            {
+                "docstatus": 1,
+                "sales_person": TEST_SALES_PERSON,
+                "customer": TEST_CUSTOMER,
+                "visit_date": ["between", ["2026-01-01", "2026-12-31"]],
+            },
+        )
+        self.assertEqual(target.completed_visits, actual)
+
+        # Drift the counter behind the incremental updates' back
+        frappe.db.set_value("Visit Target Detail", target.name, "completed_visits", actual + 5)
+        self.assertIn((target.name, actual), get_drifted_targets())
+
+        # The job commits; keep the test's transaction open so it is rolled back afterwards
+        with patch.object(frappe.db, "commit"):
+            updated = run_reconciliation(full=True)
+
+        self.assertGreaterEqual(updated, 1)
+        self.assertEqual(get_target_row().completed_visits, actual)
+        self.assertNotIn(target.name, [name for name, _count in get_drifted_targets()])